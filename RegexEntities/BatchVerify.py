@@ -0,0 +1,104 @@
+import json
+import sys
+from argparse import ArgumentParser
+from typing import Dict, List
+from RegexEntities.ClueMatcher import ClueMatcher, compile_clue
+from RegexEntities.CrosswordGrid import CrosswordGrid, dict_to_grid
+
+
+def batch_verify(puzzle: CrosswordGrid, submissions: List[str]) -> bytearray:
+    """
+    Check many submitted grids against one puzzle. Each clue is compiled once,
+    and each distinct line is matched once however many submissions share it.
+
+    Results are one byte per line, 1 if the line matches its clue, laid out per
+    submission as its rows then its columns. A submission of the wrong length
+    fails every line.
+
+    :param puzzle: puzzle to check against
+    :param submissions: submitted grids, each a string of its cells along rows
+    :return: bytearray of len(submissions) * (rows + cols) line results
+    """
+    row_clues = puzzle.get_row_clues()
+    col_clues = puzzle.get_col_clues()
+    rows, cols = len(row_clues), len(col_clues)
+    lines = rows + cols
+    results = bytearray(len(submissions) * lines)
+    valid = [index for index, submission in enumerate(submissions)
+             if len(submission) == rows * cols]
+
+    for row, clue in enumerate(row_clues):
+        matcher = compile_clue(clue)
+        matched: Dict[str, int] = {}
+        for index in valid:
+            line = submissions[index][row * cols:(row + 1) * cols]
+            if line not in matched:
+                matched[line] = matcher.matches(line)
+            results[index * lines + row] = matched[line]
+
+    for col, clue in enumerate(col_clues):
+        matcher = compile_clue(clue)
+        matched = {}
+        for index in valid:
+            line = submissions[index][col::cols]
+            if line not in matched:
+                matched[line] = matcher.matches(line)
+            results[index * lines + rows + col] = matched[line]
+    return results
+
+
+def check_clues(puzzle: CrosswordGrid) -> None:
+    """
+    Check every clue is in the dialect ClueMatcher handles, so untrusted
+    puzzles are never matched by backtracking in re
+
+    :param puzzle: puzzle to check
+    :raises ValueError: if a clue is outside the dialect
+    """
+    for clue in puzzle.get_row_clues() + puzzle.get_col_clues():
+        try:
+            ClueMatcher(clue)
+        except ValueError:
+            raise ValueError("Clue is not in the generated clue dialect: " + clue)
+
+
+def solved(results: bytearray, lines: int) -> List[bool]:
+    """
+    :param results: output of batch_verify
+    :param lines: rows plus columns of the puzzle
+    :return: for each submission, True if every line matched
+    """
+    return [all(results[start:start + lines]) for start in range(0, len(results), lines)]
+
+
+def format_results(results: bytearray, lines: int) -> List[str]:
+    """
+    :param results: output of batch_verify
+    :param lines: rows plus columns of the puzzle
+    :return: for each submission, its line results as a string of 0s and 1s
+    """
+    return [bytes(48 + bit for bit in results[start:start + lines]).decode()
+            for start in range(0, len(results), lines)]
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Check many submitted grids against one puzzle")
+    parser.add_argument("puzzle", help="JSON file of the puzzle, as from CrosswordGrid.to_dict")
+    parser.add_argument("submissions", help="file of submitted grids, one per line along rows")
+    args = parser.parse_args()
+
+    with open(args.puzzle) as puzzle_file:
+        puzzle = dict_to_grid(json.load(puzzle_file))
+    with open(args.submissions) as submissions_file:
+        submissions = [line.rstrip("\n").upper() for line in submissions_file]
+
+    lines = len(puzzle.get_row_clues()) + len(puzzle.get_col_clues())
+    results = batch_verify(puzzle, submissions)
+    for line_results in format_results(results, lines):
+        print(line_results)
+    print("{0} of {1} submissions solved".format(sum(solved(results, lines)), len(submissions)),
+          file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
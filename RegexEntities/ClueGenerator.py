@@ -1,11 +1,18 @@
+from RegexEntities.CluePool import CluePool
 from RegexEntities.CrosswordGrid import CrosswordGrid, word_to_contents
 from RegexEntities.PremadeClues import get_premade_phrases
 from RegexEntities.GroupManager import Group, GroupManager
 from RegexEntities.SolutionGrid import SolutionGrid
-from random import choice, sample, randint, shuffle
+import os
+from concurrent.futures import ProcessPoolExecutor
+from random import choice, sample, randint, seed, shuffle
 from string import ascii_uppercase, digits
+from time import perf_counter
 from typing import Tuple, List
 
+# Pool of pre-generated cell clue pairs, used by restrict_cell_two_ranges when set
+_clue_pool: CluePool = None
+
 
 def rand_letter(exclude: List[str] = None) -> str:
     """
@@ -14,10 +21,7 @@ def rand_letter(exclude: List[str] = None) -> str:
     """
     if exclude is None:
         exclude = []
-    letter = choice(ascii_uppercase)
-    while letter in exclude:
-        letter = choice(ascii_uppercase)
-    return letter
+    return choice([letter for letter in ascii_uppercase if letter not in exclude])
 
 
 def rand_number(exclude: List[str] = None) -> str:
@@ -27,10 +31,7 @@ def rand_number(exclude: List[str] = None) -> str:
     """
     if exclude is None:
         exclude = []
-    digit = choice(digits)
-    while digit in exclude:
-        digit = choice(digits)
-    return digit
+    return choice([digit for digit in digits if digit not in exclude])
 
 
 def rand_char(exclude: List[str] = None) -> str:
@@ -40,10 +41,7 @@ def rand_char(exclude: List[str] = None) -> str:
     """
     if exclude is None:
         exclude = []
-    char = choice(ascii_uppercase + digits)
-    while char in exclude:
-        char = choice(ascii_uppercase + digits)
-    return char
+    return choice([char for char in ascii_uppercase + digits if char not in exclude])
 
 
 def rangechar(include: str) -> str:
@@ -95,9 +93,35 @@ def make_range(include: List[str], exclude: List[str] = None) -> Tuple[str, List
     return chosen, secondary
 
 
+def use_clue_pool(pool: CluePool = None) -> None:
+    """
+    Draw the clue pairs of restrict_cell_two_ranges from the given pool,
+    or generate each pair directly if None.
+
+    :param pool: pool filled by make_two_ranges
+    """
+    global _clue_pool
+    _clue_pool = pool
+
+
 def restrict_cell_two_ranges(char: str) -> Tuple[str, str]:
     """
-    Create two one-letter clues which allow only the given character as a solution
+    Create two one-letter clues which allow only the given character as a solution,
+    drawn from the clue pool if one is in use.
+
+    Precondition: len(char) == 1
+
+    :param char: answer character desired
+    :return: tuple of two clues
+    """
+    if _clue_pool is not None:
+        return _clue_pool.draw(char)
+    return make_two_ranges(char)
+
+
+def make_two_ranges(char: str) -> Tuple[str, str]:
+    """
+    Generate two one-letter clues which allow only the given character as a solution
 
     Precondition: len(char) == 1
 
@@ -123,26 +147,79 @@ def make_series_options(include: str) -> str:
     return "(" + include + "|" + other_series + ")"
 
 
+class DeadlineExceeded(Exception):
+    """
+    Raised when puzzle generation runs past its Deadline
+    """
+    pass
+
+
+class Deadline:
+    _expires_at: float
+    """
+    Point in time after which puzzle generation should be abandoned
+
+    _expires_at: perf_counter() value at which the deadline passes
+    """
+
+    def __init__(self, seconds: float):
+        """
+        Create a Deadline which passes the given number of seconds from now
+        :param seconds: time budget in seconds
+        """
+        self._expires_at = perf_counter() + seconds
+
+    def remaining(self) -> float:
+        """
+        :return: seconds left before the deadline, negative once it has passed
+        """
+        return self._expires_at - perf_counter()
+
+    def expired(self) -> bool:
+        """
+        :return: True if the deadline has passed
+        """
+        return self.remaining() <= 0
+
+    def check(self) -> None:
+        """
+        Raise DeadlineExceeded if the deadline has passed
+        """
+        if self.expired():
+            raise DeadlineExceeded()
+
+
 class _ClueGenerator:
     _solution: str
     _rows: int
     _cols: int
+    _deadline: Deadline
     """
     Abstract class to generate clues. 
     
     _solution: Solution to the puzzle.
     _rows: rows in the Crossword grid
     _cols: columns in the Crossword grid
+    _deadline: optional, point after which generation is abandoned
     """
 
-    def __init__(self, solution: str, shape: Tuple[int, int]):
+    def __init__(self, solution: str, shape: Tuple[int, int], deadline: Deadline = None):
         """
         Create a ClueGenerator creating puzzles with the given solution and shape
         :param solution: solution to generated puzzles
         :param shape: shape of the crossword grid
+        :param deadline: optional, generation raises DeadlineExceeded once it passes
         """
         self._solution = solution
         self._rows, self._cols = shape
+        self._deadline = deadline
+
+    def _check_deadline(self) -> None:
+        """
+        Raise DeadlineExceeded if this generator's deadline has passed
+        """
+        if self._deadline is not None:
+            self._deadline.check()
 
     def generate_puzzle(self, filled: bool = False) -> CrosswordGrid:
         raise NotImplementedError()
@@ -159,15 +236,18 @@ class ClueGeneratorIndividualOptionPairs(_ClueGenerator):
         row_clues = ["" for _ in range(self._rows)]
         col_clues = ["" for _ in range(self._cols)]
         for row in range(self._rows):
+            self._check_deadline()
             for col in range(self._cols):
-                clues = list(restrict_cell_two_ranges(contents[row, col]))
+                clues = list(restrict_cell_two_ranges(
+                    self._solution[row * self._cols + col]))
                 shuffle(clues)
                 row_clues[row] += clues[0]
                 col_clues[col] += clues[1]
         if not filled:
             contents = None
         return CrosswordGrid((self._rows, self._cols), contents=contents,
-                             row_clues=row_clues, col_clues=col_clues)
+                             row_clues=row_clues, col_clues=col_clues,
+                             solution=self._solution)
 
 
 class ClueGeneratorSeries(_ClueGenerator):
@@ -181,11 +261,38 @@ class ClueGeneratorSeries(_ClueGenerator):
     def generate_puzzle(self, filled: bool = False) -> CrosswordGrid:
         group_manager = GroupManager()
         solution_grid = SolutionGrid(self._solution, (self._rows, self._cols))
-        curr_group = 0
+        self._row_pass(solution_grid, group_manager, 0)
+
+        for col in range(self._cols):
+            self._check_deadline()
+            for row in range(self._rows):
+                cell = solution_grid[(row, col)]
+                if cell.get_col_clue() == "":
+                    if not group_manager.get_group((row, col)).is_specified():
+                        col_clue, _ = make_range([cell.get_char()])
+                        cell.set_col_clue(col_clue)
+                        group_manager.get_group((row, col)).set_specified()
+                    else:
+                        cell.set_col_clue(".")
+                cell.set_defining_col_clue()
+
+        return solution_grid.to_crosswordgrid()
+
+    def _row_pass(self, solution_grid: SolutionGrid, group_manager: GroupManager,
+                  curr_group: int) -> int:
+        """
+        Give each row a series clue over a few of its cells, and clues to
+        each of its other cells. Only the series cells are left without column clues.
 
+        :param solution_grid: grid of this generator's solution and shape
+        :param group_manager: manager to add the groups of cells to
+        :param curr_group: first group number to use
+        :return: next unused group number
+        """
         for row in range(self._rows):
+            self._check_deadline()
             series_len = randint(2, 4)
-            series_starts = randint(0, self._rows - series_len)
+            series_starts = randint(0, self._cols - series_len)
             series_indices = []
             series_word = ""
             for col in range(self._cols):
@@ -218,19 +325,128 @@ class ClueGeneratorSeries(_ClueGenerator):
             solution_grid[series_indices[0]].set_defining_row_clue()
             solution_grid.set_row_clues(series_indices, make_series_options(series_word))
             curr_group += 1
+        return curr_group
 
-        for col in range(self._cols):
-            for row in range(self._rows):
-                cell = solution_grid[(row, col)]
-                if cell.get_col_clue() == "":
-                    if not group_manager.get_group((row, col)).is_specified():
-                        col_clue, _ = make_range([cell.get_char()])
+
+class ClueGeneratorParallelSeries(ClueGeneratorSeries):
+    _bands: int
+    """
+    Generate clues as ClueGeneratorSeries does, for grids large enough that
+    one puzzle is worth spreading over processes. The row pass is split into
+    bands of rows and the column pass into bands of columns, each generated
+    in a worker process, and the bands are merged into one SolutionGrid.
+
+    Group numbers are partitioned by band: a row uses fewer group numbers
+    than it has columns, so a band starting at row r numbers its groups from
+    r * cols. A series is specified by a range in the column of its leftmost
+    cell, as in the sequential column pass.
+
+    _bands: most worker processes, and bands per pass
+    """
+
+    def __init__(self, solution: str, shape: Tuple[int, int], deadline: Deadline = None,
+                 bands: int = None):
+        """
+        :param solution: solution to generated puzzles
+        :param shape: shape of the crossword grid
+        :param deadline: optional, generation raises DeadlineExceeded once it passes
+        :param bands: most worker processes, by default one per CPU
+        """
+        super().__init__(solution, shape, deadline)
+        self._bands = bands or os.cpu_count() or 1
+
+    def generate_puzzle(self, filled: bool = False) -> CrosswordGrid:
+        solution_grid = SolutionGrid(self._solution, (self._rows, self._cols))
+        group_manager = GroupManager()
+        row_bands = _split(self._rows, self._bands)
+        col_bands = _split(self._cols, self._bands)
+
+        with ProcessPoolExecutor(max_workers=max(len(row_bands), len(col_bands)),
+                                 initializer=_init_band_worker) as executor:
+            futures = [executor.submit(_series_row_band,
+                                       self._solution[first * self._cols:last * self._cols],
+                                       (last - first, self._cols), first * self._cols,
+                                       self._deadline)
+                       for first, last in row_bands]
+            for (first, _), future in zip(row_bands, futures):
+                band_grid, band_groups = future.result()
+                solution_grid.paste(band_grid, first)
+                group_manager.merge(band_groups, first)
+
+            needs_range = set()
+            for group in group_manager.groups():
+                if not group.is_specified():
+                    needs_range.add(group.get_indices()[0])
+                    group.set_specified()
+            futures = [executor.submit(_series_col_band,
+                                       [[(solution_grid[(row, col)].get_col_clue(),
+                                          solution_grid[(row, col)].get_char(),
+                                          (row, col) in needs_range)
+                                         for row in range(self._rows)]
+                                        for col in range(first, last)],
+                                       self._deadline)
+                       for first, last in col_bands]
+            for (first, _), future in zip(col_bands, futures):
+                for col, col_clues in enumerate(future.result(), first):
+                    for row, col_clue in enumerate(col_clues):
+                        cell = solution_grid[(row, col)]
                         cell.set_col_clue(col_clue)
-                        group_manager.get_group((row, col)).set_specified()
-                    else:
-                        cell.set_col_clue(".")
-                cell.set_defining_col_clue()
+                        cell.set_defining_col_clue()
 
         return solution_grid.to_crosswordgrid()
 
 
+def _split(length: int, bands: int) -> List[Tuple[int, int]]:
+    """
+    :param length: number of rows or columns to split
+    :param bands: most bands to split into
+    :return: first and one past last index of each band, in order
+    """
+    bands = max(1, min(bands, length))
+    return [(length * band // bands, length * (band + 1) // bands) for band in range(bands)]
+
+
+def _init_band_worker() -> None:
+    """
+    Prepare a worker process. Forked workers would otherwise share the
+    parent's random state and a clue pool whose refill thread they lack.
+    """
+    seed()
+    use_clue_pool(None)
+
+
+def _series_row_band(solution: str, shape: Tuple[int, int], first_group: int,
+                     deadline: Deadline) -> Tuple[SolutionGrid, GroupManager]:
+    """
+    Run the series row pass over one band of rows, in a worker process
+
+    :param solution: solution of the band's rows
+    :param shape: rows in the band and columns in the grid
+    :param first_group: first group number the band may use
+    :param deadline: optional, generation raises DeadlineExceeded once it passes
+    :return: grid and groups of the band, indexed from its first row
+    """
+    solution_grid = SolutionGrid(solution, shape)
+    group_manager = GroupManager()
+    ClueGeneratorSeries(solution, shape, deadline)._row_pass(solution_grid, group_manager,
+                                                             first_group)
+    return solution_grid, group_manager
+
+
+def _series_col_band(columns: List[List[Tuple[str, str, bool]]],
+                     deadline: Deadline) -> List[List[str]]:
+    """
+    Run the series column pass over one band of columns, in a worker process
+
+    :param columns: for each cell of each column, its column clue from the row
+    pass, its character, and if its series needs specifying by a range
+    :param deadline: optional, generation raises DeadlineExceeded once it passes
+    :return: for each cell of each column, its column clue
+    """
+    col_clues = []
+    for column in columns:
+        if deadline is not None:
+            deadline.check()
+        col_clues.append([make_range([char])[0] if needs_range else (col_clue or ".")
+                          for col_clue, char, needs_range in column])
+    return col_clues
@@ -0,0 +1,302 @@
+import re
+from functools import lru_cache
+from string import ascii_letters, digits
+from threading import Lock
+from typing import Dict, List
+
+_ALPHABET = 128  # Matchers handle ASCII lines; others go to re
+_ALL = (1 << _ALPHABET) - 1
+_DIGITS = sum(1 << ord(char) for char in digits)
+_WORD = sum(1 << ord(char) for char in ascii_letters + digits + "_")
+_CLASSES = {"w": _WORD, "W": _ALL & ~_WORD, "d": _DIGITS, "D": _ALL & ~_DIGITS}
+_SPECIAL = set(".^$*+?{}[]\\|()")
+_MAX_STATES = 1024  # Most states a matcher remembers
+_MAX_RESULTS = 1024  # Most line results a matcher remembers
+
+
+class _Segment:
+    firsts: int
+    lasts: int
+    """
+    Part of a clue matching one or more characters
+
+    firsts: positions which may consume the segment's first character
+    lasts: positions which may consume the segment's last character
+    """
+
+    def __init__(self, firsts: int, lasts: int):
+        self.firsts = firsts
+        self.lasts = lasts
+
+
+class ClueMatcher:
+    _source: str
+    _masks: List[int]
+    _follow: List[int]
+    _start: int
+    _accept: int
+    _positions_for: Dict[str, int]
+    _consumed: List[int]
+    _state_of: Dict[int, int]
+    _transitions: List[Dict[str, int]]
+    _accepting: List[bool]
+    _results: Dict[str, bool]
+    _lock: Lock
+    """
+    Matcher for the clue dialect the generators emit: bracket classes, ., \\w,
+    \\W, \\d, \\D, literal characters, any of those followed by +, and
+    alternations of literal strings.
+
+    The clue is parsed into positions, each consuming one character from a
+    character mask, and the possible successors of each position. Lines are
+    matched against a deterministic table built lazily from those: each
+    state stands for the set of positions which consumed the last character,
+    and its transition on a character is worked out the first time the
+    character is seen there. Matching is then one dict lookup per character,
+    without backtracking, and a fresh clue costs only its parse. Results for
+    lines already matched are remembered, as a grid rechecks the same lines.
+
+    _source: the clue, matched with re for non-ASCII lines
+    _masks: for each position, bit set of the characters it consumes
+    _follow: for each position, bit set of the positions which may consume the next character
+    _start: bit set of the positions which may consume the first character
+    _accept: bit set of the positions which may consume the last character
+    _positions_for: key is character, value is bit set of the positions consuming it
+    _consumed: for each state, bit set of the positions which consumed the
+    last character. State 0 rejects and state 1 is the start, before any character.
+    _state_of: key is bit set of positions, value is the state standing for it
+    _transitions: for each state, key is character and value is the next state
+    _accepting: for each state, if a line ending there matches
+    _results: key is a line already matched, value is if it matched
+    _lock: guards adding states and transitions
+    """
+
+    def __init__(self, clue: str):
+        """
+        :param clue: clue to match
+        :raises ValueError: if the clue is outside the dialect
+        """
+        self._source = clue
+        self._masks = []
+        self._follow = []
+        segments = self._parse(clue)
+        for previous, following in zip(segments, segments[1:]):
+            for position in _bits(previous.lasts):
+                self._follow[position] |= following.firsts
+        self._start = segments[0].firsts if segments else 0
+        self._accept = segments[-1].lasts if segments else 0
+        self._positions_for = {}
+        self._consumed = [0, 0]
+        self._state_of = {0: 0}
+        self._transitions = [{}, {}]
+        self._accepting = [False, not segments]
+        self._results = {}
+        self._lock = Lock()
+
+    def _transition(self, state: int, char: str) -> int:
+        """
+        Work out and remember the transition from a state on a character
+
+        :param state: state the character is consumed from
+        :param char: ASCII character consumed
+        :return: the next state, or -1 if the table is full
+        """
+        with self._lock:
+            positions = self._positions_for.get(char)
+            if positions is None:
+                bit = 1 << ord(char)
+                positions = sum(1 << position for position, mask in enumerate(self._masks)
+                                if mask & bit)
+                self._positions_for[char] = positions
+            if state == 1:
+                active = self._start
+            else:
+                active = 0
+                for position in _bits(self._consumed[state]):
+                    active |= self._follow[position]
+            following = active & positions
+            next_state = self._state_of.get(following)
+            if next_state is None:
+                if len(self._consumed) >= _MAX_STATES:
+                    return -1
+                next_state = len(self._consumed)
+                self._consumed.append(following)
+                self._transitions.append({})
+                self._accepting.append(bool(following & self._accept))
+                self._state_of[following] = next_state
+            self._transitions[state][char] = next_state
+            return next_state
+
+    def _state(self, mask: int) -> int:
+        """
+        :param mask: characters the new position consumes
+        :return: index of the new position
+        """
+        self._masks.append(mask)
+        self._follow.append(0)
+        return len(self._masks) - 1
+
+    def _parse(self, clue: str) -> List[_Segment]:
+        """
+        :param clue: clue to parse
+        :return: segments of the clue, in order
+        :raises ValueError: if the clue is outside the dialect
+        """
+        segments = []
+        at = 0
+        while at < len(clue):
+            char = clue[at]
+            if char == "(":
+                end = clue.index(")", at)
+                segments.append(self._alternation(clue[at + 1:end]))
+                at = end + 1
+                if at < len(clue) and clue[at] in "*+?{":
+                    raise ValueError("Repeated group")
+                continue
+            if char == "[":
+                end = clue.index("]", at)
+                members = clue[at + 1:end]
+                if not members or any(member in "^-\\[" for member in members):
+                    raise ValueError("Unsupported bracket class")
+                mask = _mask(members)
+                at = end + 1
+            elif char == ".":
+                mask = _ALL & ~(1 << ord("\n"))
+                at += 1
+            elif char == "\\":
+                if clue[at + 1:at + 2] not in _CLASSES:
+                    raise ValueError("Unsupported escape")
+                mask = _CLASSES[clue[at + 1]]
+                at += 2
+            elif char in _SPECIAL or ord(char) >= _ALPHABET:
+                raise ValueError("Unsupported character " + char)
+            else:
+                mask = _mask(char)
+                at += 1
+            state = self._state(mask)
+            if at < len(clue) and clue[at] == "+":
+                self._follow[state] |= 1 << state
+                at += 1
+            if at < len(clue) and clue[at] in "*+?{":
+                raise ValueError("Unsupported repetition")
+            segments.append(_Segment(1 << state, 1 << state))
+        return segments
+
+    def _alternation(self, body: str) -> _Segment:
+        """
+        :param body: contents of a group, literal strings separated by |
+        :return: segment matching any one of the strings
+        :raises ValueError: if the group is not an alternation of literal strings
+        """
+        firsts = 0
+        lasts = 0
+        for option in body.split("|"):
+            if not option or any(char in _SPECIAL or ord(char) >= _ALPHABET
+                                 for char in option):
+                raise ValueError("Unsupported group")
+            previous = None
+            for char in option:
+                state = self._state(_mask(char))
+                if previous is None:
+                    firsts |= 1 << state
+                else:
+                    self._follow[previous] |= 1 << state
+                previous = state
+            lasts |= 1 << previous
+        return _Segment(firsts, lasts)
+
+    def matches(self, line: str) -> bool:
+        """
+        :param line: word formed by a crossword line
+        :return: True if the whole line matches the clue
+        """
+        result = self._results.get(line)
+        if result is None:
+            result = self._run(line)
+            if len(self._results) < _MAX_RESULTS:
+                self._results[line] = result
+        return result
+
+    def _run(self, line: str) -> bool:
+        """
+        :param line: word formed by a crossword line
+        :return: True if the whole line matches the clue
+        """
+        if not line.isascii():
+            return _regex(self._source).fullmatch(line) is not None
+        transitions = self._transitions
+        state = 1
+        for char in line:
+            next_state = transitions[state].get(char)
+            if next_state is None:
+                next_state = self._transition(state, char)
+                if next_state < 0:
+                    # Too many states to remember for this clue
+                    return _regex(self._source).fullmatch(line) is not None
+            if not next_state:
+                return False
+            state = next_state
+        return self._accepting[state]
+
+
+class _RegexMatcher:
+    _pattern: re.Pattern
+    """
+    Matcher for clues outside the dialect ClueMatcher handles
+
+    _pattern: compiled clue
+    """
+
+    def __init__(self, clue: str):
+        self._pattern = _regex(clue)
+
+    def matches(self, line: str) -> bool:
+        """
+        :param line: word formed by a crossword line
+        :return: True if the whole line matches the clue
+        """
+        return self._pattern.fullmatch(line) is not None
+
+
+@lru_cache(maxsize=4096)
+def compile_clue(clue: str):
+    """
+    :param clue: regular expression clue
+    :return: ClueMatcher for the clue, or a matcher using re if the clue is
+    outside its dialect. Either has matches(line) -> bool.
+    """
+    try:
+        return ClueMatcher(clue)
+    except ValueError:
+        return _RegexMatcher(clue)
+
+
+@lru_cache(maxsize=4096)
+def _regex(clue: str) -> re.Pattern:
+    return re.compile(clue)
+
+
+def _mask(chars: str) -> int:
+    """
+    :param chars: ASCII characters
+    :return: bit set of the characters
+    """
+    mask = 0
+    for char in chars:
+        if ord(char) >= _ALPHABET:
+            raise ValueError("Non-ASCII character")
+        mask |= 1 << ord(char)
+    return mask
+
+
+def _bits(mask: int) -> List[int]:
+    """
+    :param mask: bit set
+    :return: indices of the set bits
+    """
+    indices = []
+    while mask:
+        low = mask & -mask
+        indices.append(low.bit_length() - 1)
+        mask ^= low
+    return indices
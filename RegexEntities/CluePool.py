@@ -0,0 +1,127 @@
+from random import randrange
+from string import ascii_uppercase, digits
+from threading import Condition, Thread
+from typing import Callable, Dict, List, Tuple
+
+
+class CluePool:
+    _pairs: Dict[str, List[Tuple[str, str]]]
+    _capacity: int
+    _low_water: int
+    _make_pair: Callable[[str], Tuple[str, str]]
+    _condition: Condition
+    _thread: Thread
+    _stopped: bool
+    """
+    Pool of pre-generated clue pairs restricting a cell to each answer character,
+    refilled by a background thread.
+
+    _pairs: key is answer character, value is unused clue pairs for it
+    _capacity: most clue pairs kept for any one character
+    _low_water: pool size at which a character is refilled
+    _make_pair: function generating one clue pair for a character
+    _condition: guards _pairs and wakes the refill thread
+    _thread: background refill thread, None until started
+    _stopped: if the refill thread has been asked to stop
+    """
+
+    def __init__(self, make_pair: Callable[[str], Tuple[str, str]],
+                 chars: str = ascii_uppercase + digits,
+                 capacity: int = 64, low_water: int = 16):
+        """
+        Create an empty pool for the given characters.
+
+        :param make_pair: function generating one clue pair for a character
+        :param chars: answer characters to keep pairs for
+        :param capacity: most clue pairs kept for any one character
+        :param low_water: pool size at which a character is refilled
+        """
+        self._pairs = {char: [] for char in chars}
+        self._capacity = capacity
+        self._low_water = low_water
+        self._make_pair = make_pair
+        self._condition = Condition()
+        self._thread = None
+        self._stopped = False
+
+    def draw(self, char: str) -> Tuple[str, str]:
+        """
+        Remove and return a random clue pair for the given character,
+        generating one directly if none are pooled.
+
+        :param char: answer character desired
+        :return: tuple of two clues
+        """
+        with self._condition:
+            pairs = self._pairs.get(char)
+            if pairs:
+                # Swap a random pair to the end so removal is O(1)
+                index = randrange(len(pairs))
+                pairs[index], pairs[-1] = pairs[-1], pairs[index]
+                pair = pairs.pop()
+                if len(pairs) <= self._low_water:
+                    self._condition.notify()
+                return pair
+        return self._make_pair(char)
+
+    def fill(self) -> None:
+        """
+        Fill every character's pool to capacity in the calling thread.
+        """
+        while not self._stopped:
+            char = self._lowest()
+            if char is None:
+                return
+            pair = self._make_pair(char)
+            with self._condition:
+                if len(self._pairs[char]) < self._capacity:
+                    self._pairs[char].append(pair)
+
+    def start(self) -> None:
+        """
+        Start the background thread keeping the pool filled.
+        """
+        if self._thread is None:
+            self._stopped = False
+            self._thread = Thread(target=self._refill, name="clue-pool", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background refill thread.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sizes(self) -> Dict[str, int]:
+        """
+        :return: number of pooled clue pairs for each character
+        """
+        with self._condition:
+            return {char: len(pairs) for char, pairs in self._pairs.items()}
+
+    def _lowest(self) -> str:
+        """
+        :return: the character with fewest pooled pairs, or None if all are full
+        """
+        with self._condition:
+            char = min(self._pairs, key=lambda key: len(self._pairs[key]))
+            if len(self._pairs[char]) >= self._capacity:
+                return None
+            return char
+
+    def _refill(self) -> None:
+        """
+        Body of the refill thread: fill the pool, then sleep until a
+        character drops to the low water mark.
+        """
+        while not self._stopped:
+            self.fill()
+            with self._condition:
+                while (not self._stopped and
+                       all(len(pairs) > self._low_water for pairs in self._pairs.values())):
+                    self._condition.wait()
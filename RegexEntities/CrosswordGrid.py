@@ -1,26 +1,121 @@
-from typing import List, Tuple
-import re
-from numpy import ndarray, array
+from __future__ import annotations
+from typing import Dict, List, Tuple, Union
+from weakref import WeakValueDictionary
+from RegexEntities.ClueMatcher import compile_clue
 
 
-class CrosswordGrid:
+class PuzzleDefinition:
     _rows: int
     _cols: int
-    _contents: ndarray  # ndarray used to enforce shape and string lengths
-    _row_clues: List[str]
-    _col_clues: List[str]
+    _row_clues: Tuple[str, ...]
+    _col_clues: Tuple[str, ...]
     _hint: str
+    _solution: bytes
+    _blank: bytes
     """
+    Immutable parts of a puzzle, shared by reference between every grid
+    showing that puzzle. Use intern_definition to get the shared instance.
+
     _rows: number of rows in the crossword grid
     _cols: number of columns in the crossword grid
-    _contents: contents of the crossword
     _row_clues: clues on the crossword rows
     _col_clues: clues on the crossword columns
     _hint: hint to the solution
+    _solution: solution along rows, one ASCII byte per cell, or None if unknown
+    _blank: contents of an empty grid of this shape
     """
+    __slots__ = ("_rows", "_cols", "_row_clues", "_col_clues", "_hint", "_solution",
+                 "_blank", "__weakref__")
+
+    def __init__(self, shape: Tuple[int, int], row_clues: Tuple[str, ...],
+                 col_clues: Tuple[str, ...], hint: str = "", solution: bytes = None):
+        """
+        Precondition: the clues and solution are of appropriate sizes
+
+        :param shape: shape of the crossword grid
+        :param row_clues: clues for the rows
+        :param col_clues: clues for the columns
+        :param hint: hint to the solution
+        :param solution: optional, solution along rows as bytes
+        """
+        self._rows, self._cols = shape
+        self._row_clues = tuple(row_clues)
+        self._col_clues = tuple(col_clues)
+        self._hint = hint
+        self._solution = solution
+        self._blank = b" " * (self._rows * self._cols)
+
+    def _key(self) -> Tuple:
+        return (self._rows, self._cols, self._row_clues, self._col_clues,
+                self._hint, self._solution)
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PuzzleDefinition) and self._key() == other._key()
+
+    def __hash__(self) -> int:
+        return hash(self._key())
+
+    def get_shape(self) -> Tuple[int, int]:
+        return self._rows, self._cols
+
+    def get_row_clues(self) -> Tuple[str, ...]:
+        return self._row_clues
+
+    def get_col_clues(self) -> Tuple[str, ...]:
+        return self._col_clues
+
+    def get_hint(self) -> str:
+        return self._hint
+
+    def get_solution(self) -> bytes:
+        return self._solution
 
-    def __init__(self, shape: Tuple[int, int], contents: ndarray = None,
-                 row_clues: List[str] = None, col_clues: List[str] = None):
+    def get_blank(self) -> bytes:
+        return self._blank
+
+    def replace(self, row_clues: Tuple[str, ...] = None, col_clues: Tuple[str, ...] = None,
+                hint: str = None) -> PuzzleDefinition:
+        """
+        :param row_clues: optional, new row clues
+        :param col_clues: optional, new column clues
+        :param hint: optional, new hint
+        :return: interned definition equal to this one except for the given parts
+        """
+        return intern_definition(PuzzleDefinition(
+            (self._rows, self._cols),
+            self._row_clues if row_clues is None else row_clues,
+            self._col_clues if col_clues is None else col_clues,
+            self._hint if hint is None else hint,
+            self._solution))
+
+
+# Live definitions, so equal puzzles share one instance
+_definitions: WeakValueDictionary = WeakValueDictionary()
+
+
+def intern_definition(definition: PuzzleDefinition) -> PuzzleDefinition:
+    """
+    :param definition: a puzzle definition
+    :return: the live definition equal to the given one, or the given one if none is live
+    """
+    return _definitions.setdefault(definition, definition)
+
+
+class CrosswordGrid:
+    _definition: PuzzleDefinition
+    _contents: Union[bytes, bytearray]
+    """
+    A player's view of a puzzle: the shared definition and the cells they filled.
+
+    _definition: shape, clues, hint and solution of the puzzle, shared between grids
+    _contents: contents of the crossword, one ASCII byte per cell along rows.
+    Immutable bytes, possibly shared, until the first write copies them to a bytearray.
+    """
+    __slots__ = ("_definition", "_contents")
+
+    def __init__(self, shape: Tuple[int, int], contents: Union[bytearray, str] = None,
+                 row_clues: List[str] = None, col_clues: List[str] = None,
+                 solution: str = None):
         """
         Construct a new Crossword grid. The number of rows and columns must
         be specified, the contents and clues are optional and will be left
@@ -29,25 +124,60 @@ class CrosswordGrid:
         Precondition: if provided, the contents and clues are of appropriate sizes
 
         :param shape: shape of the crossword grid
-        :param contents: optional, contents of filled cells. Empty if not specified.
+        :param contents: optional, contents of filled cells as a bytearray from
+        word_to_contents, a string along rows, or a NumPy array. Empty if not specified.
         :param row_clues: optional, clues for the rows. Empty if not specified.
         :param col_clues: optional, clues for the columns. Empty if not specified.
+        :param solution: optional, solution to the puzzle along rows
         """
-        self._rows, self._cols = shape
+        rows, cols = shape
+        if row_clues is None:
+            row_clues = ['' for _ in range(rows)]
+        if col_clues is None:
+            col_clues = ['' for _ in range(cols)]
+        if solution is not None:
+            solution = _encode(solution)
+        self._definition = intern_definition(
+            PuzzleDefinition(shape, row_clues, col_clues, solution=solution))
 
         if contents is None:
-            contents = array([[' ' for _ in range(self._cols)]
-                              for _ in range(self._rows)],
-                             dtype='U1')
+            contents = self._definition.get_blank()
+        elif isinstance(contents, str):
+            contents = _encode(contents)
+        elif not isinstance(contents, (bytes, bytearray)):
+            # NumPy array of single characters
+            contents = _encode("".join(char or " " for char in contents.ravel()))
+        contents = bytes(contents)
+        if contents == solution:
+            contents = self._definition.get_solution()
         self._contents = contents
 
-        if row_clues is None:
-            row_clues = ['' for _ in range(self._rows)]
-        self._row_clues = row_clues
+    def new_player_grid(self) -> CrosswordGrid:
+        """
+        :return: empty grid sharing this grid's puzzle definition
+        """
+        return player_grid(self._definition)
 
-        if col_clues is None:
-            col_clues = ['' for _ in range(self._cols)]
-        self._col_clues = col_clues
+    def get_definition(self) -> PuzzleDefinition:
+        """
+        :return: the shared definition of this grid's puzzle
+        """
+        return self._definition
+
+    def get_solution(self) -> str:
+        """
+        :return: solution to the puzzle, or None if unknown
+        """
+        solution = self._definition.get_solution()
+        return None if solution is None else solution.decode("ascii")
+
+    def _writable(self) -> bytearray:
+        """
+        :return: the contents, copied first if they may be shared
+        """
+        if not isinstance(self._contents, bytearray):
+            self._contents = bytearray(self._contents)
+        return self._contents
 
     def __getitem__(self, index: Tuple[int, int]) -> str:
         """
@@ -58,7 +188,7 @@ class CrosswordGrid:
         :param index: crossword position to examine
         :return: the character at the given position
         """
-        return self._contents[index]
+        return chr(self._contents[index[0] * self._definition.get_shape()[1] + index[1]])
 
     def __setitem__(self, index: Tuple[int, int], value: str) -> None:
         """
@@ -70,37 +200,80 @@ class CrosswordGrid:
         :param index: crossword position to set
         :param value: value to set position to
         """
-        self._contents[index] = value
+        self._writable()[index[0] * self._definition.get_shape()[1] + index[1]] = \
+            _encode(value[:1] or " ")[0]
 
     def clear(self) -> None:
         """
         Blank the crossword contents.
         """
-        for row in range(self._rows):
-            for col in range(self._cols):
-                self._contents[row, col] = " "
+        self._contents = self._definition.get_blank()
+
+    def fill(self, word: str) -> None:
+        """
+        Set the crossword contents to the given word along rows.
+
+        Precondition: len(word) == number of cells
+
+        :param word: the word to fill the grid with
+        """
+        self._contents = bytearray(_encode(word))
+
+    def row_view(self, index: int) -> memoryview:
+        """
+        Precondition: 0 <= index <= self._rows
+
+        :param index: index of crossword row
+        :return: view of the row's bytes, sharing memory with the grid until
+        its next copy on write
+        """
+        cols = self._definition.get_shape()[1]
+        return memoryview(self._contents)[index * cols:(index + 1) * cols]
+
+    def col_view(self, index: int) -> memoryview:
+        """
+        Precondition: 0 <= index <= self._cols
+
+        :param index: index of crossword column
+        :return: strided view of the column's bytes, sharing memory with the
+        grid until its next copy on write
+        """
+        return memoryview(self._contents)[index::self._definition.get_shape()[1]]
+
+    def as_array(self):
+        """
+        Requires NumPy, which is otherwise not needed.
+
+        :return: copy of the contents as a NumPy array of single characters
+        """
+        from numpy import array
+        rows = self._definition.get_shape()[0]
+        return array([list(self.get_row(row)) for row in range(rows)], dtype="U1")
 
     def __str__(self) -> str:
         """
         :return: String representation of the crossword grid
         """
-        col_width = [len(col_clue) + 2 for col_clue in self._col_clues]
-        col_width.insert(0, max([len(row_clue) + 2 for row_clue in self._row_clues]))
+        rows, cols = self._definition.get_shape()
+        row_clues = self._definition.get_row_clues()
+        col_clues = self._definition.get_col_clues()
+        col_width = [len(col_clue) + 2 for col_clue in col_clues]
+        col_width.insert(0, max([len(row_clue) + 2 for row_clue in row_clues]))
         table_length = sum(col_width) + len(col_width) + 1
 
         output = ("-" * table_length) + "\n"
         output += "|{0:^{row_clue_len}}|".format("", row_clue_len=col_width[0])
-        for col in range(self._cols):
-            output += "{0:^{col_len}}|".format(self._col_clues[col],
+        for col in range(cols):
+            output += "{0:^{col_len}}|".format(col_clues[col],
                                                col_len=col_width[col + 1])
         output += "\n"
         output += ("-" * table_length) + "\n"
 
-        for row in range(self._rows):
-            output += "|{0:^{row_clue_len}}|".format(self._row_clues[row],
+        for row in range(rows):
+            output += "|{0:^{row_clue_len}}|".format(row_clues[row],
                                                      row_clue_len=col_width[0])
-            for col in range(self._cols):
-                output += "{0:^{col_len}}|".format(self._contents[row, col],
+            for col in range(cols):
+                output += "{0:^{col_len}}|".format(self[row, col],
                                                    col_len=col_width[col + 1])
             output += "\n"
             output += ("-" * table_length) + "\n"
@@ -114,19 +287,19 @@ class CrosswordGrid:
 
         :param row_clues: values to set the row clues to
         """
-        self._row_clues = row_clues
+        self._definition = self._definition.replace(row_clues=row_clues)
 
     def get_row_clues(self) -> List[str]:
         """
         :return: Row clues of this crossword puzzle
         """
-        return self._row_clues
+        return list(self._definition.get_row_clues())
 
     def get_col_clues(self) -> List[str]:
         """
         :return: Column clues of this crossword puzzle
         """
-        return self._col_clues
+        return list(self._definition.get_col_clues())
 
     def set_col_clues(self, col_clues: List[str]) -> None:
         """
@@ -136,7 +309,7 @@ class CrosswordGrid:
 
         :param col_clues: values to set the column clues to
         """
-        self._col_clues = col_clues
+        self._definition = self._definition.replace(col_clues=col_clues)
 
     def get_row(self, index: int) -> str:
         """
@@ -145,10 +318,8 @@ class CrosswordGrid:
         :param index: index of crossword row
         :return: the word formed by the given row
         """
-        word = ""
-        for col in range(self._cols):
-            word += self._contents[index, col]
-        return word
+        cols = self._definition.get_shape()[1]
+        return self._contents[index * cols:(index + 1) * cols].decode("ascii")
 
     def get_col(self, index: int) -> str:
         """
@@ -157,18 +328,15 @@ class CrosswordGrid:
         :param index: index of crossword column
         :return: the word formed by the given column
         """
-        word = ""
-        for row in range(self._rows):
-            word += self._contents[row, index]
-        return word
+        return self._contents[index::self._definition.get_shape()[1]].decode("ascii")
 
     def row_check(self) -> bool:
         """
         Check the rows of the crossword
         :return: True if the words in the rows match the row clues
         """
-        for row in range(self._rows):
-            if re.search("^" + self._row_clues[row] + "$", self.get_row(row)) is None:
+        for row, clue in enumerate(self._definition.get_row_clues()):
+            if not compile_clue(clue).matches(self.get_row(row)):
                 return False
         return True
 
@@ -177,11 +345,43 @@ class CrosswordGrid:
         Check the columns of the crossword
         :return: True if the words in the columns match the column clues
         """
-        for col in range(self._cols):
-            if re.search("^" + self._col_clues[col] + "$", self.get_col(col)) is None:
+        for col, clue in enumerate(self._definition.get_col_clues()):
+            if not compile_clue(clue).matches(self.get_col(col)):
                 return False
         return True
 
+    def check_row(self, index: int) -> bool:
+        """
+        Precondition: 0 <= index <= self._rows
+
+        :param index: index of crossword row
+        :return: True if the word in the row matches its clue
+        """
+        clue = self._definition.get_row_clues()[index]
+        return compile_clue(clue).matches(self.get_row(index))
+
+    def check_col(self, index: int) -> bool:
+        """
+        Precondition: 0 <= index <= self._cols
+
+        :param index: index of crossword column
+        :return: True if the word in the column matches its clue
+        """
+        clue = self._definition.get_col_clues()[index]
+        return compile_clue(clue).matches(self.get_col(index))
+
+    def row_results(self) -> List[bool]:
+        """
+        :return: for each row, True if its word matches its clue
+        """
+        return [self.check_row(row) for row in range(self._definition.get_shape()[0])]
+
+    def col_results(self) -> List[bool]:
+        """
+        :return: for each column, True if its word matches its clue
+        """
+        return [self.check_col(col) for col in range(self._definition.get_shape()[1])]
+
     def grid_check(self) -> bool:
         """
         Check the full crossword grid
@@ -190,30 +390,76 @@ class CrosswordGrid:
         return self.row_check() and self.col_check()
 
     def set_hint(self, hint: str) -> None:
-        self._hint = hint
+        self._definition = self._definition.replace(hint=hint)
 
     def get_hint(self) -> str:
-        return self._hint
+        return self._definition.get_hint()
+
+    def to_dict(self) -> Dict[str, object]:
+        """
+        :return: JSON-compatible representation of the grid, read by dict_to_grid
+        """
+        return {"shape": list(self._definition.get_shape()),
+                "contents": self._contents.decode("ascii"),
+                "row_clues": self.get_row_clues(),
+                "col_clues": self.get_col_clues(),
+                "hint": self.get_hint(),
+                "solution": self.get_solution()}
 
 
-def word_to_contents(word: str, shape: Tuple[int, int]) -> ndarray:
+def word_to_contents(word: str, shape: Tuple[int, int]) -> bytearray:
     """
-    Shape a word into an ndarray which can be used as crossword contents
+    Shape a word into a bytearray which can be used as crossword contents
 
     Precondition: len(word) == shape[0] * shape[1]
 
     :param word: the word to reshape
-    :param shape: the ndarray shape
-    :return: ndarray of given shape with word along rows
+    :param shape: the grid shape
+    :return: bytearray of the word along rows, one byte per cell
+    """
+    return bytearray(_encode(word))
+
+
+def player_grid(definition: PuzzleDefinition) -> CrosswordGrid:
+    """
+    Create an empty grid for a player of the given puzzle. The grid holds only
+    a reference to the definition until the player fills a cell.
+
+    :param definition: interned definition of the puzzle
+    :return: empty grid sharing the definition
     """
-    contents = ndarray(shape=shape, dtype="U1")
-    curr_row = 0
-    curr_col = 0
-    for char in word:
-        contents[curr_row, curr_col] = char
-        curr_col += 1
-        if curr_col == shape[1]:
-            curr_row += 1
-            curr_col = 0
-    return contents
+    grid = CrosswordGrid.__new__(CrosswordGrid)
+    grid._definition = definition
+    grid._contents = definition.get_blank()
+    return grid
 
+
+def dict_to_grid(data: Dict[str, object]) -> CrosswordGrid:
+    """
+    Rebuild a grid from the output of CrosswordGrid.to_dict
+
+    :param data: representation of the grid
+    :return: grid with the represented shape, contents, clues and hint
+    :raises ValueError: if the parts of the representation do not fit together
+    """
+    rows, cols = data["shape"]
+    if (len(data["contents"]) != rows * cols or len(data["row_clues"]) != rows
+            or len(data["col_clues"]) != cols):
+        raise ValueError("Grid contents and clues do not match its shape")
+    solution = data.get("solution")
+    if solution is not None and len(solution) != rows * cols:
+        raise ValueError("Grid solution does not match its shape")
+    grid = CrosswordGrid((rows, cols), contents=str(data["contents"]),
+                         row_clues=[str(clue) for clue in data["row_clues"]],
+                         col_clues=[str(clue) for clue in data["col_clues"]],
+                         solution=None if solution is None else str(solution))
+    grid.set_hint(str(data["hint"]))
+    return grid
+
+
+def _encode(word: str) -> bytes:
+    """
+    :param word: characters to store in a grid
+    :return: one byte per character, with non-ASCII characters replaced by ?
+    """
+    return word.encode("ascii", errors="replace")
@@ -0,0 +1,137 @@
+from hashlib import sha256
+from math import ceil, log
+from struct import Struct, error as StructError
+from threading import Lock
+from typing import List
+from RegexEntities.CrosswordGrid import CrosswordGrid
+from RegexEntities.Snapshot import write_atomic
+
+# Magic, number of bits, number of hash functions, number of items added
+_HEADER = Struct("<4sQIQ")
+_MAGIC = b"RXBF"
+
+
+def fingerprint(puzzle: CrosswordGrid) -> bytes:
+    """
+    Canonical digest of a generated puzzle, identifying it by shape, clues and solution.
+
+    Precondition: the puzzle knows its solution, or its contents are its solution
+
+    :param puzzle: puzzle to identify
+    :return: 32 byte digest
+    """
+    rows = len(puzzle.get_row_clues())
+    cols = len(puzzle.get_col_clues())
+    solution = puzzle.get_solution()
+    if solution is None:
+        solution = "".join(puzzle.get_row(row) for row in range(rows))
+    # Unit separators can not occur in clues, so distinct puzzles never collide
+    parts = ["{0}x{1}".format(rows, cols), "\x1f".join(puzzle.get_row_clues()),
+             "\x1f".join(puzzle.get_col_clues()), solution]
+    return sha256("\x1e".join(parts).encode()).digest()
+
+
+class BloomFilter:
+    _bits: bytearray
+    _num_bits: int
+    _num_hashes: int
+    _count: int
+    _lock: Lock
+    """
+    Fixed-size probabilistic set of fingerprints. Membership tests may report
+    false positives, never false negatives.
+
+    _bits: the filter's bit array
+    _num_bits: number of bits in the filter
+    _num_hashes: number of bits set per fingerprint
+    _count: number of fingerprints added
+    _lock: guards _bits and _count
+    """
+
+    def __init__(self, capacity: int = 1000000, error_rate: float = 0.001,
+                 num_bits: int = None, num_hashes: int = None):
+        """
+        Create an empty filter sized to hold the given number of fingerprints at
+        the given false positive rate, unless its size is given directly.
+
+        :param capacity: fingerprints expected to be added
+        :param error_rate: false positive rate once capacity fingerprints are added
+        :param num_bits: optional, number of bits in the filter
+        :param num_hashes: optional, number of bits set per fingerprint
+        """
+        if num_bits is None:
+            num_bits = ceil(-capacity * log(error_rate) / log(2) ** 2)
+        if num_hashes is None:
+            num_hashes = max(1, round(num_bits / capacity * log(2)))
+        self._num_bits = num_bits
+        self._num_hashes = num_hashes
+        self._bits = bytearray((num_bits + 7) // 8)
+        self._count = 0
+        self._lock = Lock()
+
+    def _positions(self, key: bytes) -> List[int]:
+        """
+        :param key: fingerprint
+        :return: bit positions for the fingerprint, by double hashing its two halves
+        """
+        first = int.from_bytes(key[:8], "little")
+        second = int.from_bytes(key[8:16], "little") | 1
+        return [(first + i * second) % self._num_bits for i in range(self._num_hashes)]
+
+    def __contains__(self, key: bytes) -> bool:
+        """
+        :param key: fingerprint
+        :return: True if the fingerprint was probably added, False if it certainly was not
+        """
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(key))
+
+    def add(self, key: bytes) -> None:
+        """
+        Add a fingerprint to the filter
+        :param key: fingerprint
+        """
+        positions = self._positions(key)
+        with self._lock:
+            for position in positions:
+                self._bits[position >> 3] |= 1 << (position & 7)
+            self._count += 1
+
+    def __len__(self) -> int:
+        """
+        :return: number of fingerprints added
+        """
+        return self._count
+
+    def save(self, path: str) -> None:
+        """
+        Write the filter to disk
+        :param path: file to write to
+        """
+        with self._lock:
+            header = _HEADER.pack(_MAGIC, self._num_bits, self._num_hashes, self._count)
+            bits = bytes(self._bits)
+        write_atomic(path, header + bits)
+
+
+def load_bloom_filter(path: str) -> BloomFilter:
+    """
+    Read a filter written by BloomFilter.save
+
+    :param path: file to read from
+    :return: the saved filter, or None if the file is missing or malformed
+    """
+    try:
+        with open(path, "rb") as filter_file:
+            data = filter_file.read()
+        magic, num_bits, num_hashes, count = _HEADER.unpack_from(data)
+    except (OSError, StructError):
+        return None
+    bits = data[_HEADER.size:]
+    if magic != _MAGIC or len(bits) != (num_bits + 7) // 8 or num_hashes < 1:
+        return None
+    bloom_filter = BloomFilter(num_bits=num_bits, num_hashes=num_hashes)
+    bloom_filter._bits[:] = bits
+    bloom_filter._count = count
+    return bloom_filter
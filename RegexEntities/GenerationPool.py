@@ -0,0 +1,168 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from typing import Callable, Deque, Dict, TypeVar
+from RegexEntities.CrosswordGrid import CrosswordGrid
+
+T = TypeVar("T")
+
+
+class GenerationBusy(Exception):
+    """
+    Raised when the generation pool is saturated and has no prefetched puzzle
+    """
+    pass
+
+
+class GenerationPool:
+    _executor: ThreadPoolExecutor
+    _queue_limit: int
+    _depth: int
+    _prefetched: Deque[CrosswordGrid]
+    _prefetch_size: int
+    _make_prefetch: Callable[[], CrosswordGrid]
+    _refilling: bool
+    _lock: Lock
+    _completed: int
+    _rejected: int
+    _prefetch_served: int
+    _max_depth: int
+    """
+    Bounded pool of worker threads running puzzle generation apart from the
+    request threads, with a small stock of prefetched puzzles for when it is full.
+
+    _executor: worker threads
+    _queue_limit: most generation tasks running or queued at once
+    _depth: generation tasks running or queued
+    _prefetched: puzzles generated ahead of time
+    _prefetch_size: most puzzles kept in _prefetched
+    _make_prefetch: function generating a puzzle to prefetch
+    _refilling: if a prefetch task is running or queued
+    _lock: guards the counters and _prefetched
+    _completed: generation tasks finished
+    _rejected: requests turned away as busy
+    _prefetch_served: requests given a prefetched puzzle
+    _max_depth: greatest _depth reached
+    """
+
+    def __init__(self, make_prefetch: Callable[[], CrosswordGrid], workers: int = 2,
+                 queue_limit: int = 8, prefetch_size: int = 4):
+        """
+        :param make_prefetch: function generating a puzzle to prefetch
+        :param workers: number of worker threads
+        :param queue_limit: most generation tasks running or queued at once
+        :param prefetch_size: most puzzles kept prefetched
+        """
+        self._executor = ThreadPoolExecutor(max_workers=workers,
+                                            thread_name_prefix="generation")
+        self._queue_limit = queue_limit
+        self._depth = 0
+        self._prefetched = deque()
+        self._prefetch_size = prefetch_size
+        self._make_prefetch = make_prefetch
+        self._refilling = False
+        self._lock = Lock()
+        self._completed = 0
+        self._rejected = 0
+        self._prefetch_served = 0
+        self._max_depth = 0
+
+    def run(self, task: Callable[[], CrosswordGrid]) -> CrosswordGrid:
+        """
+        Run a generation task on the pool and wait for its puzzle. If the pool
+        is saturated, return a prefetched puzzle instead.
+
+        :param task: function generating a puzzle
+        :return: the generated or prefetched puzzle
+        :raises GenerationBusy: if the pool is saturated and nothing is prefetched
+        """
+        with self._lock:
+            if self._depth >= self._queue_limit:
+                if self._prefetched:
+                    self._prefetch_served += 1
+                    return self._prefetched.popleft()
+                self._rejected += 1
+                raise GenerationBusy()
+            self._enqueue()
+        return self._executor.submit(self._tracked, task).result()
+
+    def run_exact(self, task: Callable[[], T]) -> T:
+        """
+        Run a generation task on the pool and wait for its result, for tasks
+        a prefetched puzzle can not stand in for
+
+        :param task: function generating a puzzle
+        :return: the task's result
+        :raises GenerationBusy: if the pool is saturated
+        :raises Exception: whatever the task raises
+        """
+        with self._lock:
+            if self._depth >= self._queue_limit:
+                self._rejected += 1
+                raise GenerationBusy()
+            self._enqueue()
+        return self._executor.submit(self._tracked, task).result()
+
+    def refill(self) -> None:
+        """
+        Start prefetching puzzles if the stock is low and no prefetch is running
+        """
+        with self._lock:
+            if (self._refilling or len(self._prefetched) >= self._prefetch_size
+                    or self._depth >= self._queue_limit):
+                return
+            self._refilling = True
+            self._enqueue()
+        self._executor.submit(self._tracked, self._prefetch)
+
+    def shutdown(self) -> None:
+        """
+        Stop the worker threads once queued tasks finish
+        """
+        self._executor.shutdown()
+
+    def metrics(self) -> Dict[str, int]:
+        """
+        :return: current queue depth and counts of completed, rejected and prefetch-served requests
+        """
+        with self._lock:
+            return {"queue_depth": self._depth, "max_queue_depth": self._max_depth,
+                    "queue_limit": self._queue_limit, "completed": self._completed,
+                    "rejected": self._rejected, "prefetch_served": self._prefetch_served,
+                    "prefetched": len(self._prefetched)}
+
+    def _enqueue(self) -> None:
+        """
+        Count a task as queued.
+
+        Precondition: self._lock is held
+        """
+        self._depth += 1
+        self._max_depth = max(self._max_depth, self._depth)
+
+    def _tracked(self, task: Callable[[], T]) -> T:
+        """
+        Run a task on a worker, counting it out of the queue when it finishes
+        and topping up the prefetched puzzles once the pool is idle.
+        """
+        try:
+            return task()
+        finally:
+            with self._lock:
+                self._depth -= 1
+                self._completed += 1
+                idle = self._depth == 0
+            if idle:
+                self.refill()
+
+    def _prefetch(self) -> None:
+        """
+        Prefetch one puzzle
+        """
+        try:
+            puzzle = self._make_prefetch()
+            with self._lock:
+                self._prefetched.append(puzzle)
+        finally:
+            with self._lock:
+                self._refilling = False
@@ -1,3 +1,4 @@
+from __future__ import annotations
 from typing import List, Tuple, Dict
 
 
@@ -31,20 +32,41 @@ class Group:
 
 class GroupManager:
     _groups: Dict[int, Group]
+    _by_index: Dict[Tuple[int, int], Group]
     """
     _groups: key is group number, value is Group
+    _by_index: key is index of a cell, value is the first Group added containing it
     """
 
     def __init__(self):
         self._groups = {}
+        self._by_index = {}
 
     def __setitem__(self, group_number: int, group: Group) -> None:
         self._groups[group_number] = group
+        for index in group.get_indices():
+            self._by_index.setdefault(index, group)
 
     def __getitem__(self, group_number: int) -> Group:
         return self._groups[group_number]
 
     def get_group(self, index: Tuple[int, int]) -> Group:
-        for group in self._groups.values():
-            if index in group.get_indices():
-                return group
+        return self._by_index.get(index)
+
+    def groups(self) -> List[Group]:
+        return list(self._groups.values())
+
+    def merge(self, other: GroupManager, first_row: int = 0) -> None:
+        """
+        Add the groups of another manager, keeping their group numbers.
+
+        Precondition: no group number is in both managers
+
+        :param other: manager of groups over a band of rows
+        :param first_row: row of this manager's grid the band starts at
+        """
+        for group_number, group in other._groups.items():
+            indices = [(row + first_row, col) for row, col in group.get_indices()]
+            shifted = Group(group.get_type(), indices)
+            shifted.set_specified(group.is_specified())
+            self[group_number] = shifted
@@ -1,5 +1,22 @@
-from RegexEntities import ClueGenerator, CrosswordGrid, Solutions
-from typing import List
+from RegexEntities import ClueGenerator, CrosswordGrid, Fingerprint, Solutions
+from RegexEntities.StrategyRegistry import StrategyRegistry
+from string import ascii_uppercase, digits
+from threading import Lock
+from time import perf_counter
+from typing import Callable, Dict, List, Tuple
+
+# Strategies used by generate_puzzle, in order of preference
+strategies = StrategyRegistry()
+strategies.register(ClueGenerator.ClueGeneratorSeries)
+strategies.register(ClueGenerator.ClueGeneratorIndividualOptionPairs)
+
+# Generation attempts before a puzzle which may have been served is accepted
+REPEAT_ATTEMPTS = 3
+
+# Strategies tried by generate_puzzle_within, in order of preference.
+# The last is the fallback and always runs to completion.
+DEADLINE_STRATEGIES = [ClueGenerator.ClueGeneratorSeries,
+                       ClueGenerator.ClueGeneratorIndividualOptionPairs]
 
 
 class PuzzleManager:
@@ -11,34 +28,167 @@ class PuzzleManager:
     _premade_solution: Solutions.PremadeSolutionIterator
     _num_premade: int
     _at_premade: int
+    _premade_lock: Lock
     _random_solution: Solutions.RandomSolutionIterator
     _puzzle: CrosswordGrid.CrosswordGrid
+    _served: Fingerprint.BloomFilter
+
+    def __init__(self, snapshot: Dict[str, object] = None,
+                 served: Fingerprint.BloomFilter = None):
+        """
+        Start from the given snapshot if it is valid, otherwise with a new
+        premade puzzle.
 
-    def __init__(self):
-        self._premade_solutions = Solutions.PremadeSolutionIterator()
+        :param snapshot: optional, state returned by to_snapshot
+        :param served: optional, fingerprints of puzzles already served, which
+        new puzzles avoid repeating
+        """
+        self._served = served
+        self._premade_solutions = Solutions.PremadeSolutionIterator((5, 5))
         self._num_premade = self._premade_solutions.len_premade()
         self._at_premade = 0
-        self._random_solutions = Solutions.RandomSolutionIterator()
+        # Guards _premade_solutions and _at_premade, as requests and
+        # generation workers draw premade solutions concurrently
+        self._premade_lock = Lock()
+        self._random_solutions = Solutions.RandomSolutionIterator((5, 5))
+        if snapshot is not None:
+            try:
+                self.restore_snapshot(snapshot)
+                return
+            except (KeyError, ValueError, TypeError):
+                pass
         self.new_premade_puzzle()
 
+    def to_snapshot(self) -> Dict[str, object]:
+        """
+        :return: JSON-compatible state of the manager, read by restore_snapshot
+        """
+        with self._premade_lock:
+            order, at = self._premade_solutions.get_state()
+            at_premade = self._at_premade
+        return {"premade_digest": Solutions.premade_digest(),
+                "premade_order": order,
+                "premade_at": at,
+                "at_premade": at_premade,
+                "puzzle": self._puzzle.to_dict()}
+
+    def restore_snapshot(self, snapshot: Dict[str, object]) -> None:
+        """
+        Resume from state returned by to_snapshot
+
+        :param snapshot: state to resume from
+        :raises ValueError: if the state does not fit the premade solutions
+        """
+        if snapshot["premade_digest"] != Solutions.premade_digest():
+            raise ValueError("Snapshot was taken with different premade solutions")
+        puzzle = CrosswordGrid.dict_to_grid(snapshot["puzzle"])
+        at_premade = int(snapshot["at_premade"])
+        with self._premade_lock:
+            self._premade_solutions.set_state(snapshot["premade_order"], snapshot["premade_at"])
+            self._at_premade = at_premade
+        self._puzzle = puzzle
+
     def new_premade_puzzle(self) -> None:
         """
         Set self._puzzle to a new puzzle with premade solution.
         If no remaining premade clues are available, return a random puzzle.
         """
-        try:
-            hint, solution = next(self._premade_solutions)
-            self._puzzle = generate_puzzle(solution, hint)
-            self._at_premade += 1
-        except StopIteration:
-            self.new_random_puzzle()
+        self.set_puzzle(self.make_premade_puzzle())
 
     def new_random_puzzle(self) -> None:
         """
         Set self._puzzle to a new puzzle with random solution
         """
-        hint, solution = next(self._random_solutions)
-        self._puzzle = generate_puzzle(solution, hint)
+        self.set_puzzle(self.make_random_puzzle())
+
+    def make_premade_puzzle(self) -> CrosswordGrid.CrosswordGrid:
+        """
+        Generate a puzzle with the next premade solution, or a random puzzle
+        if no remaining premade clues are available. The current puzzle is unchanged.
+
+        :return: the generated puzzle
+        """
+        with self._premade_lock:
+            drawn = next(self._premade_solutions, None)
+            if drawn is not None:
+                self._at_premade += 1
+        # Clues are generated outside the lock, so other draws need not wait
+        if drawn is None:
+            return self.make_random_puzzle()
+        return self._unserved_puzzle(lambda: drawn)
+
+    def make_random_puzzle(self) -> CrosswordGrid.CrosswordGrid:
+        """
+        Generate a puzzle with random solution. The current puzzle is unchanged.
+
+        :return: the generated puzzle
+        """
+        return self._unserved_puzzle(lambda: next(self._random_solutions))
+
+    def set_puzzle(self, puzzle: CrosswordGrid.CrosswordGrid) -> None:
+        """
+        Make the given puzzle the current puzzle, starting with an empty grid.
+        Generated puzzles are filled with their solution, which players must
+        never be checked against.
+
+        :param puzzle: puzzle from make_premade_puzzle or make_random_puzzle
+        """
+        self._puzzle = puzzle.new_player_grid()
+
+    def _unserved_puzzle(self, next_solution: Callable[[], Tuple[str, str]]
+                         ) -> CrosswordGrid.CrosswordGrid:
+        """
+        Generate a puzzle which has not been served before, generating again
+        when its fingerprint is in self._served, up to REPEAT_ATTEMPTS times.
+
+        :param next_solution: function returning the hint and solution to generate from
+        :return: the puzzle, recorded as served
+        """
+        hint, solution = next_solution()
+        puzzle = generate_puzzle(solution, hint)
+        if self._served is None:
+            return puzzle
+        key = Fingerprint.fingerprint(puzzle)
+        for _ in range(REPEAT_ATTEMPTS - 1):
+            if key not in self._served:
+                break
+            hint, solution = next_solution()
+            puzzle = generate_puzzle(solution, hint)
+            key = Fingerprint.fingerprint(puzzle)
+        self._served.add(key)
+        return puzzle
+
+    def new_custom_puzzle(self, solution: str, hint: str,
+                          budget: float) -> Tuple[str, Dict[str, float]]:
+        """
+        Set self._puzzle to a new puzzle with the given solution, generated
+        within the given time budget.
+
+        :param solution: user-submitted solution, normalized before use
+        :param hint: hint for the puzzle
+        :param budget: seconds available for generation
+        :return: name of the strategy used and the timing breakdown in milliseconds
+        :raises ValueError: if the solution can not fill the grid
+        """
+        puzzle, strategy, timing = self.make_custom_puzzle(solution, hint, budget)
+        self.set_puzzle(puzzle)
+        return strategy, timing
+
+    def make_custom_puzzle(self, solution: str, hint: str, budget: float
+                           ) -> Tuple[CrosswordGrid.CrosswordGrid, str, Dict[str, float]]:
+        """
+        Generate a puzzle with the given solution within the given time budget.
+        The current puzzle is unchanged.
+
+        :param solution: user-submitted solution, normalized before use
+        :param hint: hint for the puzzle
+        :param budget: seconds available for generation
+        :return: the puzzle, name of the strategy used and the timing breakdown
+        in milliseconds
+        :raises ValueError: if the solution can not fill the grid
+        """
+        solution = normalize_solution(solution, (5, 5))
+        return generate_puzzle_within(solution, hint, budget)
 
     def get_puzzle(self) -> CrosswordGrid.CrosswordGrid:
         """
@@ -46,6 +196,12 @@ class PuzzleManager:
         """
         return self._puzzle
 
+    def get_puzzle_id(self) -> str:
+        """
+        :return: short id of the current puzzle, from its fingerprint
+        """
+        return Fingerprint.fingerprint(self._puzzle).hex()[:16]
+
     def get_hint(self) -> str:
         """
         :return: Hint for current crossword puzzle
@@ -70,12 +226,36 @@ class PuzzleManager:
         """
         return self._puzzle.grid_check()
 
+    def check_lines(self) -> Tuple[List[bool], List[bool]]:
+        """
+        :return: for each row and for each column of the current crossword
+        puzzle, True if it matches its clue
+        """
+        return self._puzzle.row_results(), self._puzzle.col_results()
+
     def premade_remain(self) -> bool:
         """
         :return: True if unused premade solutions remain
         """
         return self._at_premade < self._num_premade
 
+    def update_cell(self, row: int, col: int, value: str) -> None:
+        """
+        Set one entry of the current crossword puzzle
+        :param row: row of the entry
+        :param col: column of the entry
+        :param value: character to enter, blank if empty
+        """
+        self._puzzle[(row, col)] = value or " "
+
+    def check_cell_lines(self, row: int, col: int) -> Tuple[bool, bool]:
+        """
+        :param row: row of a cell
+        :param col: column of a cell
+        :return: whether the row and the column through the cell match their clues
+        """
+        return self._puzzle.check_row(row), self._puzzle.check_col(col)
+
     def update(self, update_data) -> None:
         """
         Update the puzzle entries based on input data
@@ -86,12 +266,84 @@ class PuzzleManager:
 def generate_puzzle(solution: str, hint: str) -> CrosswordGrid.CrosswordGrid:
     """
     Construct a puzzle with the given solution and hint.
-    Uses the ClueGeneratorSeries
+    Uses the strategy chosen by the strategies registry
     :param solution: solution to the puzzle
     :param hint: hint for the puzzle
     :return: puzzle with given hint and clues uniquely specifying given solution
     """
-    clue_generator = ClueGenerator.ClueGeneratorSeries(solution, (5, 5))
-    puzzle = clue_generator.generate_puzzle()
+    puzzle = strategies.generate(solution, (5, 5))
     puzzle.set_hint(hint)
     return puzzle
+
+
+def warm_strategies(shape: Tuple[int, int] = (5, 5)) -> None:
+    """
+    Measure each strategy in strategies on random solutions, so the first
+    puzzles players ask for are generated with the best one
+
+    :param shape: shape of the crossword grid
+    """
+    strategies.warm(shape, (solution for _, solution in Solutions.RandomSolutionIterator(shape)))
+
+
+def normalize_solution(solution: str, shape: Tuple[int, int]) -> str:
+    """
+    Uppercase a user-submitted solution and remove its whitespace
+
+    :param solution: solution as submitted
+    :param shape: shape of the grid the solution must fill
+    :return: the normalized solution
+    :raises ValueError: if the solution is the wrong length or contains
+    characters other than ASCII letters and digits
+    """
+    solution = "".join(solution.split()).upper()
+    if len(solution) != shape[0] * shape[1]:
+        raise ValueError("Solution must have exactly " + str(shape[0] * shape[1])
+                         + " letters and digits")
+    if any(char not in ascii_uppercase + digits for char in solution):
+        raise ValueError("Solution may only contain letters and digits")
+    return solution
+
+
+def generate_puzzle_within(solution: str, hint: str, budget: float,
+                           shape: Tuple[int, int] = (5, 5)
+                           ) -> Tuple[CrosswordGrid.CrosswordGrid, str, Dict[str, float]]:
+    """
+    Construct a puzzle with the given solution and hint, trying each of
+    DEADLINE_STRATEGIES in order until one produces a valid puzzle.
+    A strategy is retried while its puzzles fail their own clues, and abandoned
+    once the deadline passes; the last strategy is the fallback and always runs.
+
+    :param solution: solution to the puzzle
+    :param hint: hint for the puzzle
+    :param budget: seconds available for generation
+    :param shape: shape of the crossword grid
+    :return: the puzzle, name of the strategy which made it, and milliseconds
+    spent on each strategy tried and in total
+    """
+    deadline = ClueGenerator.Deadline(budget)
+    timing = {}
+    start = perf_counter()
+    puzzle = None
+    for strategy in DEADLINE_STRATEGIES[:-1]:
+        strategy_start = perf_counter()
+        try:
+            while puzzle is None:
+                deadline.check()
+                candidate = strategy(solution, shape, deadline).generate_puzzle(filled=True)
+                if candidate.grid_check():
+                    puzzle = candidate
+        except (ClueGenerator.DeadlineExceeded, ValueError, IndexError):
+            # Out of time, or the strategy can not handle this shape
+            pass
+        timing[strategy.__name__] = (perf_counter() - strategy_start) * 1000
+        if puzzle is not None:
+            break
+    if puzzle is None:
+        strategy = DEADLINE_STRATEGIES[-1]
+        strategy_start = perf_counter()
+        puzzle = strategy(solution, shape).generate_puzzle(filled=True)
+        timing[strategy.__name__] = (perf_counter() - strategy_start) * 1000
+    timing["total"] = (perf_counter() - start) * 1000
+    puzzle.set_hint(hint)
+    return puzzle, strategy.__name__, timing
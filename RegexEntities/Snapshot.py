@@ -0,0 +1,124 @@
+import json
+import os
+from hashlib import sha256
+from tempfile import NamedTemporaryFile
+from threading import Event, Thread
+from typing import Callable, Dict
+
+SNAPSHOT_VERSION = 1
+
+
+def _checksum(body: Dict[str, object]) -> str:
+    """
+    :param body: snapshot contents
+    :return: digest of the canonical JSON encoding of body
+    """
+    return sha256(json.dumps(body, sort_keys=True, separators=(",", ":")).encode()).hexdigest()
+
+
+def write_atomic(path: str, data: bytes) -> None:
+    """
+    Write a file through a temporary file in the same folder, named per
+    writer, then replace the file with it. A crash mid-write leaves the
+    previous file intact, and concurrent writers never share a temporary file.
+
+    :param path: file to write to
+    :param data: new contents of the file
+    """
+    with NamedTemporaryFile(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path),
+                            suffix=".tmp", delete=False) as temp_file:
+        try:
+            temp_file.write(data)
+        except BaseException:
+            temp_file.close()
+            os.remove(temp_file.name)
+            raise
+    try:
+        os.replace(temp_file.name, path)
+    except OSError:
+        os.remove(temp_file.name)
+        raise
+
+
+def save_snapshot(body: Dict[str, object], path: str) -> None:
+    """
+    Write a snapshot to disk with its checksum
+
+    :param body: JSON-compatible state to save
+    :param path: file to write to
+    """
+    envelope = {"version": SNAPSHOT_VERSION, "checksum": _checksum(body), "body": body}
+    write_atomic(path, json.dumps(envelope, separators=(",", ":")).encode())
+
+
+def load_snapshot(path: str) -> Dict[str, object]:
+    """
+    Read a snapshot written by save_snapshot
+
+    :param path: file to read from
+    :return: the saved state, or None if the file is missing, of another
+    version, or fails its checksum
+    """
+    try:
+        with open(path) as snapshot_file:
+            envelope = json.load(snapshot_file)
+        if (envelope["version"] != SNAPSHOT_VERSION or
+                envelope["checksum"] != _checksum(envelope["body"])):
+            return None
+        return envelope["body"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+class PeriodicSave:
+    _save: Callable[[], None]
+    _interval: float
+    _stop: Event
+    _thread: Thread
+    """
+    Background thread saving state at a fixed interval
+
+    _save: function saving the state
+    _interval: seconds between saves
+    _stop: set to stop the thread
+    _thread: the background thread, None until started
+    """
+
+    def __init__(self, save: Callable[[], None], interval: float):
+        """
+        :param save: function saving the state
+        :param interval: seconds between saves
+        """
+        self._save = save
+        self._interval = interval
+        self._stop = Event()
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Start saving in the background
+        """
+        if self._thread is None:
+            self._thread = Thread(target=self._run, name="periodic-save", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the background thread and save a final time. A failed final
+        save is dropped, as this runs at interpreter exit.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        try:
+            self._save()
+        except OSError:
+            pass
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                self._save()
+            except OSError:
+                pass
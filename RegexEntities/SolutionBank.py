@@ -0,0 +1,247 @@
+import sys
+from argparse import ArgumentParser
+from csv import reader
+from hashlib import sha256
+from random import choice
+from string import ascii_uppercase, digits
+from struct import Struct, error as StructError
+from typing import Dict, List, Tuple
+
+# Characters the clue generators can specify
+ALPHABET = ascii_uppercase + digits
+_BIT = {char: 1 << index for index, char in enumerate(ALPHABET)}
+# Characters removed from solutions rather than rejecting them
+_SEPARATORS = set(" \t-_'\".,:;!?&/")
+
+# Magic, version, number of entries, digest of the source CSV
+_HEADER = Struct("<4sHI32s")
+# Hint length in bytes, solution length, character profile
+_ENTRY = Struct("<HHQ")
+_MAGIC = b"RXSB"
+_VERSION = 1
+
+
+class SolutionBank:
+    _hints: List[str]
+    _solutions: List[str]
+    _profiles: List[int]
+    _by_length: Dict[int, List[int]]
+    _by_profile: Dict[int, Dict[int, List[int]]]
+    """
+    Premade pairs of hint and solution, validated and normalized when built,
+    and indexed so a solution filling any shape can be drawn without a scan.
+
+    Entries are numbered in the order they were added. A solution's profile
+    is the bit set of the ALPHABET characters it uses.
+
+    _hints: hint of each entry
+    _solutions: normalized solution of each entry
+    _profiles: profile of each entry
+    _by_length: key is solution length, value is numbers of entries of that length
+    _by_profile: key is solution length, value has key profile and value
+    numbers of entries of that length and profile
+    """
+
+    def __init__(self):
+        self._hints = []
+        self._solutions = []
+        self._profiles = []
+        self._by_length = {}
+        self._by_profile = {}
+
+    def __len__(self) -> int:
+        return len(self._solutions)
+
+    def __getitem__(self, number: int) -> Tuple[str, str]:
+        """
+        :param number: number of an entry
+        :return: hint and solution of the entry
+        """
+        return self._hints[number], self._solutions[number]
+
+    def add(self, hint: str, solution: str, profile: int = None) -> int:
+        """
+        Add an entry, without validating it
+
+        :param hint: hint for the solution
+        :param solution: normalized solution
+        :param profile: profile of the solution, computed if None
+        :return: number of the new entry
+        """
+        if profile is None:
+            profile = solution_profile(solution)
+        number = len(self._solutions)
+        self._hints.append(hint)
+        self._solutions.append(solution)
+        self._profiles.append(profile)
+        self._by_length.setdefault(len(solution), []).append(number)
+        self._by_profile.setdefault(len(solution), {}).setdefault(profile, []).append(number)
+        return number
+
+    def numbers(self, length: int, alphabet: str = None) -> List[int]:
+        """
+        :param length: solution length desired, rows * cols of the grid to fill
+        :param alphabet: if given, only entries using no other characters
+        :return: numbers of the entries of that length, in the order added
+        """
+        if alphabet is None:
+            return list(self._by_length.get(length, []))
+        allowed = solution_profile(alphabet)
+        numbers = []
+        for profile, entries in self._by_profile.get(length, {}).items():
+            if profile & ~allowed == 0:
+                numbers.extend(entries)
+        return sorted(numbers)
+
+    def draw(self, length: int) -> Tuple[str, str]:
+        """
+        :param length: solution length desired, rows * cols of the grid to fill
+        :return: hint and solution of a random entry of that length
+        :raises IndexError: if no entry has that length
+        """
+        return self[choice(self._by_length.get(length, []))]
+
+    def digest(self) -> str:
+        """
+        :return: digest identifying the entries and their numbering
+        """
+        return sha256(repr(list(zip(self._hints, self._solutions))).encode()).hexdigest()
+
+    def save(self, path: str, source_digest: bytes) -> None:
+        """
+        Write the bank in its compact binary form
+
+        :param path: file to write to
+        :param source_digest: sha256 digest of the CSV the bank was built from
+        """
+        with open(path, "wb") as bank_file:
+            bank_file.write(_HEADER.pack(_MAGIC, _VERSION, len(self), source_digest))
+            for hint, solution, profile in zip(self._hints, self._solutions, self._profiles):
+                hint_bytes = hint.encode()
+                bank_file.write(_ENTRY.pack(len(hint_bytes), len(solution), profile))
+                bank_file.write(hint_bytes)
+                bank_file.write(solution.encode("ascii"))
+
+
+def solution_profile(solution: str) -> int:
+    """
+    :param solution: string of ALPHABET characters
+    :return: bit set of the characters used
+    """
+    profile = 0
+    for char in set(solution):
+        profile |= _BIT[char]
+    return profile
+
+
+def normalize_entry(solution: str) -> str:
+    """
+    Uppercase a premade solution and remove its spaces and punctuation
+
+    :param solution: solution as written in the CSV
+    :return: the normalized solution
+    :raises ValueError: if the solution is empty, too long, or contains
+    characters no clue can specify
+    """
+    solution = "".join(char for char in solution.upper() if char not in _SEPARATORS)
+    if not solution:
+        raise ValueError("Solution is empty")
+    if len(solution) > 0xFFFF:
+        raise ValueError("Solution is too long")
+    if any(char not in _BIT for char in solution):
+        raise ValueError("Solution may only contain letters and digits")
+    return solution
+
+
+def build_bank(csv_path: str) -> Tuple[SolutionBank, List[str]]:
+    """
+    Build a bank from a CSV of hint and solution columns with a header row,
+    skipping invalid and repeated entries
+
+    :param csv_path: CSV file to read
+    :return: the bank, and a description of each entry skipped
+    """
+    bank = SolutionBank()
+    skipped = []
+    seen = set()
+    with open(csv_path, newline="") as solutions_file:
+        for line, row in enumerate(reader(solutions_file), 1):
+            if line == 1:
+                continue  # Header
+            try:
+                if len(row) < 2 or not row[0].strip():
+                    raise ValueError("Expected a hint and a solution")
+                solution = normalize_entry(row[1])
+                if solution in seen:
+                    raise ValueError("Repeats an earlier solution")
+            except ValueError as error:
+                skipped.append("line {0}: {1}".format(line, error))
+                continue
+            seen.add(solution)
+            bank.add(row[0].strip(), solution)
+    return bank, skipped
+
+
+def load_bank(csv_path: str, bank_path: str) -> SolutionBank:
+    """
+    Read the binary bank built from the CSV, or build the bank from the CSV
+    if the binary bank is missing, malformed or was built from another CSV
+
+    :param csv_path: CSV file the bank is built from
+    :param bank_path: binary file written by SolutionBank.save
+    :return: the bank
+    """
+    with open(csv_path, "rb") as csv_file:
+        source_digest = sha256(csv_file.read()).digest()
+    try:
+        with open(bank_path, "rb") as bank_file:
+            data = bank_file.read()
+        bank = _unpack_bank(data, source_digest)
+        if bank is not None:
+            return bank
+    except (OSError, StructError, UnicodeDecodeError):
+        pass
+    return build_bank(csv_path)[0]
+
+
+def _unpack_bank(data: bytes, source_digest: bytes) -> SolutionBank:
+    """
+    :param data: contents of a binary bank
+    :param source_digest: sha256 digest of the CSV the bank must be built from
+    :return: the bank, or None if it is another version or from another CSV
+    """
+    magic, version, count, digest = _HEADER.unpack_from(data)
+    if magic != _MAGIC or version != _VERSION or digest != source_digest:
+        return None
+    bank = SolutionBank()
+    at = _HEADER.size
+    for _ in range(count):
+        hint_length, solution_length, profile = _ENTRY.unpack_from(data, at)
+        at += _ENTRY.size
+        hint = data[at:at + hint_length].decode()
+        at += hint_length
+        solution = data[at:at + solution_length].decode("ascii")
+        at += solution_length
+        if len(solution) != solution_length:
+            return None
+        bank.add(hint, solution, profile)
+    return bank if at == len(data) else None
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Build the binary premade solution bank from its CSV")
+    parser.add_argument("csv", help="CSV of hint and solution columns, with a header row")
+    parser.add_argument("bank", help="binary bank file to write")
+    args = parser.parse_args()
+
+    bank, skipped = build_bank(args.csv)
+    for reason in skipped:
+        print("Skipped " + reason, file=sys.stderr)
+    with open(args.csv, "rb") as csv_file:
+        bank.save(args.bank, sha256(csv_file.read()).digest())
+    lengths = sorted({len(bank[number][1]) for number in range(len(bank))})
+    print("{0} solutions of lengths {1}".format(len(bank), lengths), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+from __future__ import annotations
 from typing import Dict, Tuple, List
 from RegexEntities.CrosswordGrid import CrosswordGrid, word_to_contents
 
@@ -137,6 +138,27 @@ class SolutionGrid:
         """
         return self._contents[index]
 
+    def get_shape(self) -> Tuple[int, int]:
+        """
+        :return: rows and columns of the grid
+        """
+        return self._rows, self._cols
+
+    def paste(self, band: SolutionGrid, first_row: int) -> None:
+        """
+        Replace a band of rows with the cells of another grid
+
+        Precondition: band has as many columns as this grid and
+        first_row + its rows <= self._rows
+
+        :param band: grid of the rows to paste
+        :param first_row: row of this grid the band starts at
+        """
+        band_rows, _ = band.get_shape()
+        for row in range(band_rows):
+            for col in range(self._cols):
+                self._contents[(first_row + row, col)] = band[(row, col)]
+
     def get_row_clues(self) -> List[str]:
         """
         Combine the row clues for each cell into a full row clue
@@ -219,11 +241,12 @@ class SolutionGrid:
         :return: CrosswordGrid with identical contents and clues
         """
         shape = (self._rows, self._cols)
-        contents = word_to_contents(self.get_solution(), shape)
+        solution = self.get_solution()
+        contents = word_to_contents(solution, shape)
         row_clues = self.get_row_clues()
         col_clues = self.get_col_clues()
         return CrosswordGrid(shape, contents=contents,
-                             row_clues=row_clues, col_clues=col_clues)
+                             row_clues=row_clues, col_clues=col_clues, solution=solution)
 
 
 def combine_to_clue(parts: List[str]) -> str:
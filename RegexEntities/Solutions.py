@@ -1,52 +1,89 @@
 from __future__ import annotations
-from csv import reader
 from random import sample, choices
 from typing import List, Tuple
-from string import ascii_uppercase, digits
+from RegexEntities.SolutionBank import ALPHABET, load_bank
 
-solutions_list = []
-with open("RegexEntities/PremadeSolutions.csv", newline="") as solutions_file:
-    solutions_reader = reader(solutions_file)
-    for row in solutions_reader:
-        solutions_list.append((row[0], row[1]))
-solutions_list = solutions_list[1:]  # Remove header
+bank = load_bank("RegexEntities/PremadeSolutions.csv", "RegexEntities/PremadeSolutions.bank")
+
+
+def premade_digest() -> str:
+    """
+    :return: digest identifying the premade solutions, so saved positions in them
+    can be checked against the current list
+    """
+    return bank.digest()
 
 
 class PremadeSolutionIterator:
-    _solutions: List[Tuple[str, str]]
+    _order: List[int]
     _at: int
+    _fitting: List[int]
     """
-    Class to iterate over premade solutions and hints
+    Class to iterate over premade solutions and hints filling a grid shape
     
-    _solutions: Premade Pairs of (Hint, Solution)
-    _at: Index of next pair to return
+    _order: Numbers in bank of premade pairs of (Hint, Solution),
+    in the order to return them
+    _at: Index in _order of next pair to return
+    _fitting: Numbers in bank of the pairs filling the shape
     """
-    def __init__(self):
+    def __init__(self, shape: Tuple[int, int] = (5, 5)):
+        """
+        :param shape: shape of the grid solutions must fill
+        """
         self._at = 0
-        self._solutions = sample(solutions_list, len(solutions_list))
+        self._fitting = bank.numbers(shape[0] * shape[1])
+        self._order = sample(self._fitting, len(self._fitting))
 
     def __iter__(self) -> PremadeSolutionIterator:
         return self
 
     def __next__(self) -> Tuple[str, str]:
-        if self._at < len(solutions_list):
-            to_return = self._solutions[self._at]
+        if self._at < len(self._order):
+            to_return = bank[self._order[self._at]]
             self._at += 1
             return to_return
         else:
             raise StopIteration
 
     def len_premade(self):
-        return len(self._solutions)
+        return len(self._order)
+
+    def get_state(self) -> Tuple[List[int], int]:
+        """
+        :return: order of the premade solutions and index of the next to return
+        """
+        return list(self._order), self._at
+
+    def set_state(self, order: List[int], at: int) -> None:
+        """
+        Resume iteration from a state returned by get_state
+
+        :param order: order of the premade solutions
+        :param at: index of the next to return
+        :raises ValueError: if the state does not fit the premade solutions
+        """
+        if sorted(order) != self._fitting or not 0 <= at <= len(order):
+            raise ValueError("Premade solution state does not match the premade solutions")
+        self._order = list(order)
+        self._at = at
 
 
 class RandomSolutionIterator:
+    _length: int
     """
-    Class to infinitely generate solutions of 25 random characters
+    Class to infinitely generate solutions of random characters
+
+    _length: characters in each solution
     """
+    def __init__(self, shape: Tuple[int, int] = (5, 5)):
+        """
+        :param shape: shape of the grid solutions must fill
+        """
+        self._length = shape[0] * shape[1]
+
     def __iter__(self):
         return self
 
     def __next__(self):
-        solution = "".join(choices(list(ascii_uppercase) + list(digits), k=25))
+        solution = "".join(choices(ALPHABET, k=self._length))
         return ("No Hint", solution)
@@ -0,0 +1,247 @@
+from RegexEntities.ClueGenerator import _ClueGenerator, Deadline
+from RegexEntities.CrosswordGrid import CrosswordGrid
+from random import choice, random
+from threading import Lock
+from time import perf_counter
+from typing import Dict, Iterator, List, Optional, Tuple, Type
+
+
+class StrategyStats:
+    _runs: int
+    _failures: int
+    _seconds: float
+    _failure_rate: float
+    _smoothing: float
+    """
+    Measured cost of one generation strategy on one grid shape
+
+    _runs: number of generation attempts
+    _failures: number of attempts which raised or produced an invalid puzzle
+    _seconds: moving average of seconds per attempt
+    _failure_rate: moving average of the fraction of attempts which failed
+    _smoothing: weight of the newest attempt in the moving averages
+    """
+
+    def __init__(self, smoothing: float = 0.1):
+        self._runs = 0
+        self._failures = 0
+        self._seconds = 0.0
+        self._failure_rate = 0.0
+        self._smoothing = smoothing
+
+    def record(self, seconds: float, failed: bool) -> None:
+        """
+        Record one generation attempt
+        :param seconds: time taken by the attempt
+        :param failed: if the attempt did not produce a valid puzzle
+        """
+        self._runs += 1
+        self._failures += failed
+        # Plain mean until there are enough runs to smooth over
+        weight = max(self._smoothing, 1 / self._runs)
+        self._seconds += weight * (seconds - self._seconds)
+        self._failure_rate += weight * (failed - self._failure_rate)
+
+    def get_runs(self) -> int:
+        return self._runs
+
+    def throughput(self) -> float:
+        """
+        :return: expected valid puzzles per second
+        """
+        if self._seconds <= 0:
+            return float("inf") if self._failure_rate < 1 else 0.0
+        return (1 - self._failure_rate) / self._seconds
+
+    def to_dict(self) -> Dict[str, float]:
+        """
+        :return: summary of the measurements
+        """
+        return {"runs": self._runs, "failures": self._failures,
+                "mean_ms": self._seconds * 1000, "failure_rate": self._failure_rate,
+                "throughput": self.throughput()}
+
+
+class StrategyRegistry:
+    _strategies: Dict[str, Type[_ClueGenerator]]
+    _stats: Dict[Tuple[str, Tuple[int, int]], StrategyStats]
+    _target: float
+    _min_runs: int
+    _explore: float
+    _overrides: Dict[Tuple[int, int], str]
+    _lock: Lock
+    """
+    Registry of clue generation strategies, choosing one per grid shape from
+    their measured throughput.
+
+    _strategies: key is strategy name, value is generator class, in order of preference
+    _stats: key is strategy name and grid shape, value is measurements
+    _target: valid puzzles per second a strategy must reach to be chosen
+    _min_runs: attempts measured on a shape before a strategy is judged on it
+    _explore: fraction of choices given to a strategy other than the best,
+    so the others keep being measured as conditions change
+    _overrides: key is grid shape, or None for all shapes, value is strategy to always use
+    _lock: guards _stats and _overrides
+    """
+
+    def __init__(self, target: float = 100.0, min_runs: int = 5, explore: float = 0.05):
+        """
+        :param target: valid puzzles per second a strategy must reach to be chosen
+        :param min_runs: attempts measured on a shape before a strategy is judged on it
+        :param explore: fraction of choices given to a strategy other than the best
+        """
+        self._strategies = {}
+        self._stats = {}
+        self._target = target
+        self._min_runs = min_runs
+        self._explore = explore
+        self._overrides = {}
+        self._lock = Lock()
+
+    def register(self, strategy: Type[_ClueGenerator]) -> None:
+        """
+        Add a strategy, preferred below those already registered
+        :param strategy: generator class
+        """
+        self._strategies[strategy.__name__] = strategy
+
+    def set_target(self, target: float) -> None:
+        """
+        :param target: valid puzzles per second a strategy must reach to be chosen
+        """
+        self._target = target
+
+    def override(self, name: str = None, shape: Tuple[int, int] = None) -> None:
+        """
+        Always use the named strategy, or go back to choosing automatically if None
+
+        :param name: registered strategy name, or None to clear the override
+        :param shape: grid shape to override, or None for all shapes
+        :raises KeyError: if no strategy is registered under the name
+        """
+        with self._lock:
+            if name is None:
+                self._overrides.pop(shape, None)
+            elif name not in self._strategies:
+                raise KeyError(name)
+            else:
+                self._overrides[shape] = name
+
+    def choose(self, shape: Tuple[int, int], exclude: List[str] = None) -> Type[_ClueGenerator]:
+        """
+        Choose the strategy for a grid shape: an override if set, otherwise the
+        first strategy not yet measured enough, otherwise the most preferred
+        strategy meeting the throughput target, otherwise the fastest. A
+        fraction _explore of choices go to one of the other strategies instead,
+        to measure it again.
+
+        Precondition: not every registered strategy is excluded
+
+        :param shape: shape of the crossword grid
+        :param exclude: optional, names of strategies not to choose
+        :return: generator class to use
+        """
+        if exclude is None:
+            exclude = []
+        with self._lock:
+            name = self._overrides.get(shape, self._overrides.get(None))
+            if name is not None and name not in exclude:
+                return self._strategies[name]
+            candidates = [(name, self._stats.get((name, shape), StrategyStats()))
+                          for name in self._strategies if name not in exclude]
+            for name, measured in candidates:
+                if measured.get_runs() < self._min_runs:
+                    return self._strategies[name]
+            best = next((name for name, measured in candidates
+                         if measured.throughput() >= self._target), None)
+            if best is None:
+                best = max(candidates, key=lambda pair: pair[1].throughput())[0]
+            others = [name for name, _ in candidates if name != best]
+            if others and random() < self._explore:
+                return self._strategies[choice(others)]
+            return self._strategies[best]
+
+    def record(self, name: str, shape: Tuple[int, int], seconds: float, failed: bool) -> None:
+        """
+        Record one generation attempt
+        :param name: strategy name
+        :param shape: shape of the crossword grid
+        :param seconds: time taken by the attempt
+        :param failed: if the attempt did not produce a valid puzzle
+        """
+        with self._lock:
+            self._stats.setdefault((name, shape), StrategyStats()).record(seconds, failed)
+
+    def generate(self, solution: str, shape: Tuple[int, int],
+                 deadline: Deadline = None) -> CrosswordGrid:
+        """
+        Generate a puzzle with the chosen strategy, recording its cost and
+        choosing another strategy after a failed attempt.
+
+        :param solution: solution to the puzzle
+        :param shape: shape of the crossword grid
+        :param deadline: optional, passed on to the generator
+        :return: puzzle whose clues match the solution
+        :raises ValueError: if every strategy failed
+        """
+        failed_strategies = []
+        while len(failed_strategies) < len(self._strategies):
+            strategy = self.choose(shape, failed_strategies)
+            puzzle = self._attempt(strategy, solution, shape, deadline)
+            if puzzle is not None:
+                return puzzle
+            failed_strategies.append(strategy.__name__)
+        raise ValueError("No strategy generated a valid puzzle")
+
+    def warm(self, shape: Tuple[int, int], solutions: Iterator[str]) -> None:
+        """
+        Measure every strategy on a shape until it has been attempted
+        _min_runs times, so choose does not explore on puzzles players wait for
+
+        :param shape: shape of the crossword grid
+        :param solutions: solutions to generate puzzles for, each used once
+        """
+        for name, strategy in self._strategies.items():
+            while True:
+                with self._lock:
+                    measured = self._stats.get((name, shape))
+                    if measured is not None and measured.get_runs() >= self._min_runs:
+                        break
+                self._attempt(strategy, next(solutions), shape)
+
+    def _attempt(self, strategy: Type[_ClueGenerator], solution: str, shape: Tuple[int, int],
+                 deadline: Deadline = None) -> Optional[CrosswordGrid]:
+        """
+        Generate a puzzle with a strategy and record the attempt
+
+        :param strategy: generator class
+        :param solution: solution to the puzzle
+        :param shape: shape of the crossword grid
+        :param deadline: optional, passed on to the generator
+        :return: puzzle whose clues match the solution, or None if the attempt failed
+        """
+        start = perf_counter()
+        try:
+            puzzle = strategy(solution, shape, deadline).generate_puzzle(filled=True)
+            if not puzzle.grid_check():
+                puzzle = None
+        except (ValueError, IndexError):
+            puzzle = None
+        self.record(strategy.__name__, shape, perf_counter() - start, puzzle is None)
+        return puzzle
+
+    def names(self) -> List[str]:
+        """
+        :return: names of the registered strategies, in order of preference
+        """
+        return list(self._strategies)
+
+    def stats(self) -> Dict[str, Dict[str, Dict[str, float]]]:
+        """
+        :return: key is grid shape as "rowsxcols", value is measurements of each strategy
+        """
+        with self._lock:
+            summary = {}
+            for (name, shape), measured in self._stats.items():
+                summary.setdefault("{0}x{1}".format(*shape), {})[name] = measured.to_dict()
+            return summary
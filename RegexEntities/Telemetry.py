@@ -0,0 +1,311 @@
+import json
+from math import ceil, log
+from threading import Lock
+from time import monotonic
+from typing import Dict, List
+from RegexEntities.Snapshot import write_atomic
+
+
+class RingBuffer:
+    _values: List[float]
+    _capacity: int
+    _next: int
+    """
+    Fixed-size buffer keeping the most recent values
+
+    _values: stored values, at most _capacity of them
+    _capacity: most values kept
+    _next: index the next value is written to once the buffer is full
+    """
+
+    def __init__(self, capacity: int):
+        self._values = []
+        self._capacity = capacity
+        self._next = 0
+
+    def append(self, value: float) -> None:
+        """
+        Add a value, overwriting the oldest once full
+        :param value: value to add
+        """
+        if len(self._values) < self._capacity:
+            self._values.append(value)
+        else:
+            self._values[self._next] = value
+            self._next = (self._next + 1) % self._capacity
+
+    def values(self) -> List[float]:
+        """
+        :return: stored values, oldest first
+        """
+        return self._values[self._next:] + self._values[:self._next]
+
+
+class QuantileSketch:
+    _gamma: float
+    _buckets: Dict[int, int]
+    _zeros: int
+    _count: int
+    _total: float
+    _max: float
+    """
+    Streaming quantile estimate of non-negative values with bounded relative
+    error. Values are counted in logarithmically sized buckets, so memory grows
+    only with the logarithm of the range of values, not with their number.
+
+    _gamma: ratio between consecutive bucket bounds
+    _buckets: key is bucket index, value is number of values in it
+    _zeros: number of values too small for any bucket
+    _count: number of values added
+    _total: sum of values added
+    _max: greatest value added
+    """
+
+    def __init__(self, relative_error: float = 0.02):
+        """
+        :param relative_error: greatest relative error of estimated quantiles
+        """
+        self._gamma = (1 + relative_error) / (1 - relative_error)
+        self._buckets = {}
+        self._zeros = 0
+        self._count = 0
+        self._total = 0.0
+        self._max = 0.0
+
+    def add(self, value: float) -> None:
+        """
+        :param value: non-negative value to add
+        """
+        self._count += 1
+        self._total += value
+        self._max = max(self._max, value)
+        if value < 1e-9:
+            self._zeros += 1
+        else:
+            index = ceil(log(value, self._gamma))
+            self._buckets[index] = self._buckets.get(index, 0) + 1
+
+    def quantile(self, q: float) -> float:
+        """
+        :param q: quantile desired, between 0 and 1
+        :return: estimate of the quantile, or 0 if no values were added
+        """
+        if self._count == 0:
+            return 0.0
+        rank = q * (self._count - 1)
+        seen = self._zeros
+        if seen > rank:
+            return 0.0
+        for index in sorted(self._buckets):
+            seen += self._buckets[index]
+            if seen > rank:
+                return min(2 * self._gamma ** index / (self._gamma + 1), self._max)
+        return self._max
+
+    def summary(self) -> Dict[str, float]:
+        """
+        :return: count, mean, maximum and common quantiles of the values
+        """
+        return {"count": self._count,
+                "mean": self._total / self._count if self._count else 0.0,
+                "p50": self.quantile(0.5), "p90": self.quantile(0.9),
+                "p99": self.quantile(0.99), "max": self._max}
+
+
+class PuzzleStats:
+    failures: int
+    error: int
+    line_failures: Dict[str, int]
+    attempts: int
+    solved: int
+    solve_seconds: float
+    solve_attempts: int
+    """
+    What players did with one puzzle
+
+    failures: failed line verifications counted against the puzzle, which may
+    include up to error failures of puzzles it replaced in TopPuzzles
+    error: greatest overcount in failures
+    line_failures: key is line, as "row 0" or "col 4", value is failed verifications of it
+    attempts: verify attempts on the puzzle
+    solved: times the puzzle was solved
+    solve_seconds: total time taken to solve it
+    solve_attempts: total verify attempts needed to solve it
+    """
+
+    def __init__(self, failures: int = 0):
+        """
+        :param failures: failures inherited from the puzzle this one replaced
+        """
+        self.failures = failures
+        self.error = failures
+        self.line_failures = {}
+        self.attempts = 0
+        self.solved = 0
+        self.solve_seconds = 0.0
+        self.solve_attempts = 0
+
+    def to_dict(self) -> Dict[str, object]:
+        """
+        :return: JSON-compatible form of the statistics
+        """
+        return {"failures": self.failures, "error": self.error,
+                "line_failures": dict(self.line_failures), "attempts": self.attempts,
+                "solved": self.solved,
+                "mean_solve_seconds": self.solve_seconds / self.solved if self.solved else 0.0,
+                "mean_solve_attempts": self.solve_attempts / self.solved if self.solved else 0.0}
+
+
+class TopPuzzles:
+    _capacity: int
+    _puzzles: Dict[str, PuzzleStats]
+    """
+    Statistics of the puzzles with the most failed line verifications, in
+    constant memory. Once full, a new puzzle replaces the one with fewest
+    failures and inherits its count as an overcount (the space-saving
+    algorithm), so any puzzle failing more than 1 / capacity of all failed
+    verifications is always kept.
+
+    _capacity: most puzzles kept
+    _puzzles: key is puzzle id, value is its statistics
+    """
+
+    def __init__(self, capacity: int = 64):
+        """
+        :param capacity: most puzzles kept
+        """
+        self._capacity = capacity
+        self._puzzles = {}
+
+    def get(self, puzzle_id: str) -> PuzzleStats:
+        """
+        :param puzzle_id: id of a puzzle
+        :return: statistics of the puzzle, started if it was not kept
+        """
+        stats = self._puzzles.get(puzzle_id)
+        if stats is None:
+            inherited = 0
+            if len(self._puzzles) >= self._capacity:
+                fewest = min(self._puzzles, key=lambda key: self._puzzles[key].failures)
+                inherited = self._puzzles.pop(fewest).failures
+            stats = self._puzzles[puzzle_id] = PuzzleStats(inherited)
+        return stats
+
+    def summary(self) -> Dict[str, Dict[str, object]]:
+        """
+        :return: key is puzzle id, value is its statistics, most failed first
+        """
+        ranked = sorted(self._puzzles.items(), key=lambda item: -item[1].failures)
+        return {puzzle_id: stats.to_dict() for puzzle_id, stats in ranked}
+
+
+class Telemetry:
+    _started: float
+    _attempts: int
+    _solve_seconds: QuantileSketch
+    _solve_attempts: QuantileSketch
+    _recent: RingBuffer
+    _line_failures: Dict[str, int]
+    _solved: int
+    _abandoned: int
+    _puzzle: str
+    _puzzles: TopPuzzles
+    _lock: Lock
+    """
+    Constant-memory record of how players get on with puzzles, fed from the verify path
+
+    _started: monotonic time the current puzzle was started, None once solved
+    _attempts: verify attempts on the current puzzle
+    _solve_seconds: distribution of time taken to solve puzzles
+    _solve_attempts: distribution of verify attempts needed to solve puzzles
+    _recent: attempts needed by the most recently solved puzzles
+    _line_failures: key is line, as "row 0" or "col 4", value is failed verifications of it
+    _solved: number of puzzles solved
+    _abandoned: number of puzzles replaced before being solved
+    _puzzle: id of the current puzzle, None if unknown
+    _puzzles: statistics of the puzzles failing most, to spot pathological ones
+    _lock: guards all other attributes
+    """
+
+    def __init__(self, recent: int = 256, puzzles: int = 64):
+        """
+        :param recent: number of recently solved puzzles to keep attempt counts for
+        :param puzzles: number of most failing puzzles to keep statistics for
+        """
+        self._started = monotonic()
+        self._attempts = 0
+        self._solve_seconds = QuantileSketch()
+        self._solve_attempts = QuantileSketch()
+        self._recent = RingBuffer(recent)
+        self._line_failures = {}
+        self._solved = 0
+        self._abandoned = 0
+        self._puzzle = None
+        self._puzzles = TopPuzzles(puzzles)
+        self._lock = Lock()
+
+    def puzzle_started(self, puzzle_id: str = None) -> None:
+        """
+        Start timing a new current puzzle
+        :param puzzle_id: optional, id of the puzzle, such as its fingerprint
+        """
+        with self._lock:
+            if self._started is not None and self._attempts > 0:
+                self._abandoned += 1
+            self._started = monotonic()
+            self._attempts = 0
+            self._puzzle = puzzle_id
+
+    def record_attempt(self, row_results: List[bool], col_results: List[bool]) -> None:
+        """
+        Record one verification of the current puzzle, counting it as solved
+        if every line matched.
+
+        :param row_results: for each row, True if it matched its clue
+        :param col_results: for each column, True if it matched its clue
+        """
+        with self._lock:
+            self._attempts += 1
+            puzzle = None if self._puzzle is None else self._puzzles.get(self._puzzle)
+            if puzzle is not None:
+                puzzle.attempts += 1
+            for kind, results in (("row", row_results), ("col", col_results)):
+                for index, matched in enumerate(results):
+                    if not matched:
+                        line = "{0} {1}".format(kind, index)
+                        self._line_failures[line] = self._line_failures.get(line, 0) + 1
+                        if puzzle is not None:
+                            puzzle.failures += 1
+                            puzzle.line_failures[line] = puzzle.line_failures.get(line, 0) + 1
+            if all(row_results) and all(col_results) and self._started is not None:
+                seconds = monotonic() - self._started
+                self._solve_seconds.add(seconds)
+                self._solve_attempts.add(self._attempts)
+                self._recent.append(self._attempts)
+                self._solved += 1
+                if puzzle is not None:
+                    puzzle.solved += 1
+                    puzzle.solve_seconds += seconds
+                    puzzle.solve_attempts += self._attempts
+                self._started = None
+
+    def summary(self) -> Dict[str, object]:
+        """
+        :return: JSON-compatible aggregate of everything recorded
+        """
+        with self._lock:
+            return {"solved": self._solved,
+                    "abandoned": self._abandoned,
+                    "current_attempts": self._attempts,
+                    "solve_seconds": self._solve_seconds.summary(),
+                    "solve_attempts": self._solve_attempts.summary(),
+                    "recent_solve_attempts": self._recent.values(),
+                    "line_failures": dict(self._line_failures),
+                    "puzzles": self._puzzles.summary()}
+
+    def dump(self, path: str) -> None:
+        """
+        Write the summary to disk
+        :param path: file to write to
+        """
+        write_atomic(path, json.dumps(self.summary(), separators=(",", ":")).encode())
@@ -0,0 +1,189 @@
+import asyncio
+import json
+from base64 import b64encode
+from hashlib import sha1
+from struct import pack, unpack
+from threading import Thread
+from typing import Dict, List
+from urllib.parse import urlsplit
+from RegexEntities.PuzzleManager import PuzzleManager
+
+_WEBSOCKET_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_MAX_PAYLOAD = 1024
+_OPCODE_TEXT = 0x1
+_OPCODE_CLOSE = 0x8
+_OPCODE_PING = 0x9
+_OPCODE_PONG = 0xA
+
+
+class LiveVerifyServer:
+    _puzzle_manager: PuzzleManager
+    _host: str
+    _port: int
+    _origins: List[str]
+    _thread: Thread
+    """
+    WebSocket server on its own asyncio event loop, taking single-cell edits
+    and answering with whether the edited row and column now match their clues.
+    Each idle connection costs one suspended coroutine.
+
+    Client messages are {"cell": "23", "value": "A"}, and replies are
+    {"row": 2, "row_ok": true, "col": 3, "col_ok": false, "solved": false}.
+
+    _puzzle_manager: manager of the puzzle being edited
+    _host: interface to listen on
+    _port: port to listen on
+    _origins: origins, as "http://host:port", whose pages may connect. If None,
+    only pages served from the host the client connected to may.
+    _thread: thread running the event loop, None until started
+    """
+
+    def __init__(self, puzzle_manager: PuzzleManager, host: str = "127.0.0.1",
+                 port: int = 5001, origins: List[str] = None):
+        """
+        :param puzzle_manager: manager of the puzzle being edited
+        :param host: interface to listen on
+        :param port: port to listen on
+        :param origins: origins whose pages may connect, by default those on the same host
+        """
+        self._puzzle_manager = puzzle_manager
+        self._host = host
+        self._port = port
+        self._origins = origins
+        self._thread = None
+
+    def start(self) -> None:
+        """
+        Start serving on a background thread
+        """
+        if self._thread is None:
+            self._thread = Thread(target=asyncio.run, args=(self._serve(),),
+                                  name="live-verify", daemon=True)
+            self._thread.start()
+
+    async def _serve(self) -> None:
+        server = await asyncio.start_server(self._connection, self._host, self._port)
+        async with server:
+            await server.serve_forever()
+
+    async def _connection(self, reader: asyncio.StreamReader,
+                          writer: asyncio.StreamWriter) -> None:
+        """
+        Complete the WebSocket handshake, then answer cell edits until the client closes
+        """
+        try:
+            if not await _handshake(reader, writer, self._origins):
+                return
+            while True:
+                opcode, payload = await _read_frame(reader)
+                if opcode == _OPCODE_TEXT:
+                    reply = self._edit(payload)
+                    writer.write(_frame(_OPCODE_TEXT, json.dumps(reply).encode()))
+                elif opcode == _OPCODE_PING:
+                    writer.write(_frame(_OPCODE_PONG, payload))
+                elif opcode == _OPCODE_CLOSE:
+                    writer.write(_frame(_OPCODE_CLOSE, payload[:2]))
+                    break
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _edit(self, payload: bytes) -> Dict[str, object]:
+        """
+        Apply one cell edit and check the lines through that cell
+        :param payload: JSON message from the client
+        :return: reply to send
+        """
+        try:
+            message = json.loads(payload)
+            row, col = int(message["cell"][0]), int(message["cell"][1])
+            value = str(message["value"]).upper()
+            if not (0 <= row < 5 and 0 <= col < 5):
+                raise ValueError
+        except (ValueError, KeyError, TypeError, IndexError):
+            return {"error": "Expected a cell and a value"}
+        self._puzzle_manager.update_cell(row, col, value)
+        row_ok, col_ok = self._puzzle_manager.check_cell_lines(row, col)
+        return {"row": row, "row_ok": row_ok, "col": col, "col_ok": col_ok,
+                "solved": row_ok and col_ok and self._puzzle_manager.check_puzzle()}
+
+
+async def _handshake(reader: asyncio.StreamReader, writer: asyncio.StreamWriter,
+                     origins: List[str] = None) -> bool:
+    """
+    Read the HTTP upgrade request and accept it if it comes from an allowed origin
+    :param origins: origins whose pages may connect, None for those on the same host
+    :return: True if the connection is now a WebSocket
+    """
+    request = await reader.readuntil(b"\r\n\r\n")
+    headers = {}
+    for line in request.decode("latin-1").split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    key = headers.get("sec-websocket-key")
+    if headers.get("upgrade", "").lower() != "websocket" or key is None:
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        return False
+    if not _allowed_origin(headers, origins):
+        writer.write(b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n")
+        await writer.drain()
+        return False
+    accept = b64encode(sha1(key.encode() + _WEBSOCKET_GUID).digest()).decode()
+    writer.write(("HTTP/1.1 101 Switching Protocols\r\n"
+                  "Upgrade: websocket\r\nConnection: Upgrade\r\n"
+                  "Sec-WebSocket-Accept: " + accept + "\r\n\r\n").encode())
+    await writer.drain()
+    return True
+
+
+def _allowed_origin(headers: Dict[str, str], origins: List[str] = None) -> bool:
+    """
+    Browsers send the page's origin with every WebSocket handshake, so pages
+    on other sites are refused here. Clients other than browsers send none.
+
+    :param headers: handshake headers, with lowercase names
+    :param origins: origins whose pages may connect, None for those on the same host
+    :return: True if the handshake may be accepted
+    """
+    origin = headers.get("origin")
+    if origin is None:
+        return True
+    if origins is not None:
+        return origin in origins
+    host = urlsplit("//" + headers.get("host", "")).hostname
+    return host is not None and urlsplit(origin).hostname == host
+
+
+async def _read_frame(reader: asyncio.StreamReader):
+    """
+    Read one client frame. Fragmented and oversized frames are refused.
+    :return: opcode and unmasked payload
+    :raises ValueError: if the frame is fragmented, unmasked or too large
+    """
+    first, second = await reader.readexactly(2)
+    if not first & 0x80 or not second & 0x80:
+        raise ValueError("Fragmented or unmasked frame")
+    length = second & 0x7F
+    if length == 126:
+        length, = unpack("!H", await reader.readexactly(2))
+    elif length == 127:
+        length, = unpack("!Q", await reader.readexactly(8))
+    if length > _MAX_PAYLOAD:
+        raise ValueError("Frame too large")
+    mask = await reader.readexactly(4)
+    payload = await reader.readexactly(length)
+    return first & 0x0F, bytes(byte ^ mask[index % 4] for index, byte in enumerate(payload))
+
+
+def _frame(opcode: int, payload: bytes) -> bytes:
+    """
+    :param opcode: frame type
+    :param payload: data to send, under 64 KiB
+    :return: unmasked, unfragmented server frame
+    """
+    if len(payload) < 126:
+        return pack("!BB", 0x80 | opcode, len(payload)) + payload
+    return pack("!BBH", 0x80 | opcode, 126, len(payload)) + payload
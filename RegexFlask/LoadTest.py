@@ -0,0 +1,222 @@
+"""
+Local load generator for the Flask app.
+
+Each simulated player opens /puzzle, submits /verify several times and then
+asks for /new_random. Run in-process against a fresh app, which saves no
+snapshot, served filter or telemetry, or against an app already listening
+on a local port:
+
+    python -m RegexFlask.LoadTest --concurrency 8 --sessions 200
+    python -m RegexFlask.LoadTest --port 5000 --output results.json
+"""
+import json
+from argparse import ArgumentParser
+from http.client import HTTPConnection
+from random import choice
+from string import ascii_uppercase, digits
+from threading import Lock, Thread
+from time import perf_counter
+from typing import Callable, Dict, List
+from urllib.parse import urlencode
+
+ROUTES = ["/puzzle", "/verify", "/new_random"]
+
+# Settings of the in-process app, which must not touch the real instance files
+LOAD_TEST_CONFIG = {"SNAPSHOT_FILE": None, "SERVED_FILTER_FILE": None,
+                    "TELEMETRY_FILE": None, "LIVE_VERIFY_PORT": None}
+
+
+class LatencyRecorder:
+    _latencies: Dict[str, List[float]]
+    _errors: Dict[str, int]
+    _lock: Lock
+    """
+    Thread-safe collection of request latencies
+
+    _latencies: key is route, value is latencies in seconds
+    _errors: key is route, value is number of failed requests
+    _lock: guards _latencies and _errors
+    """
+
+    def __init__(self):
+        self._latencies = {route: [] for route in ROUTES}
+        self._errors = {route: 0 for route in ROUTES}
+        self._lock = Lock()
+
+    def record(self, route: str, seconds: float, ok: bool) -> None:
+        """
+        Record one request
+        :param route: route requested
+        :param seconds: time taken for the response
+        :param ok: if the response was not an error
+        """
+        with self._lock:
+            self._latencies[route].append(seconds)
+            if not ok:
+                self._errors[route] += 1
+
+    def summary(self, elapsed: float) -> Dict[str, object]:
+        """
+        :param elapsed: wall time of the whole run in seconds
+        :return: throughput and latency percentiles in milliseconds, overall and per route
+        """
+        with self._lock:
+            total = sum(len(latencies) for latencies in self._latencies.values())
+            routes = {}
+            for route, latencies in self._latencies.items():
+                ordered = sorted(latencies)
+                routes[route] = {
+                    "requests": len(ordered),
+                    "errors": self._errors[route],
+                    "throughput": len(ordered) / elapsed,
+                    "p50_ms": percentile(ordered, 50) * 1000,
+                    "p95_ms": percentile(ordered, 95) * 1000,
+                    "p99_ms": percentile(ordered, 99) * 1000,
+                    "max_ms": (ordered[-1] if ordered else 0.0) * 1000,
+                }
+        return {"elapsed_s": elapsed, "requests": total,
+                "throughput": total / elapsed, "routes": routes}
+
+
+def percentile(ordered: List[float], percent: float) -> float:
+    """
+    Nearest-rank percentile
+
+    :param ordered: values in increasing order
+    :param percent: percentile desired, between 0 and 100
+    :return: the percentile, or 0 if there are no values
+    """
+    if not ordered:
+        return 0.0
+    rank = max(1, -(-len(ordered) * percent // 100))
+    return ordered[int(rank) - 1]
+
+
+def random_entries() -> Dict[str, str]:
+    """
+    :return: form data filling every cell of the puzzle with a random character
+    """
+    return {str(row) + str(col): choice(ascii_uppercase + digits)
+            for row in range(5) for col in range(5)}
+
+
+def in_process_requester(app) -> Callable[[str, str, Dict[str, str]], int]:
+    """
+    :param app: Flask app to send requests to
+    :return: function sending one request through a test client, returning its status
+    """
+    client = app.test_client()
+
+    def send(method: str, path: str, data: Dict[str, str] = None) -> int:
+        return client.open(path, method=method, data=data).status_code
+    return send
+
+
+def port_requester(port: int) -> Callable[[str, str, Dict[str, str]], int]:
+    """
+    :param port: local port the app listens on
+    :return: function sending one request over a kept-alive connection, returning its status
+    """
+    connection = HTTPConnection("127.0.0.1", port, timeout=30)
+
+    def send(method: str, path: str, data: Dict[str, str] = None) -> int:
+        body = None
+        headers = {}
+        if data is not None:
+            body = urlencode(data)
+            headers["Content-Type"] = "application/x-www-form-urlencoded"
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        response.read()
+        return response.status
+    return send
+
+
+def run_session(send: Callable[[str, str, Dict[str, str]], int], verifies: int,
+                recorder: LatencyRecorder) -> None:
+    """
+    Play one session: view the puzzle, verify repeatedly, then get a new puzzle.
+    Redirects are not followed, so each request is timed on its own.
+
+    :param send: function sending one request
+    :param verifies: number of /verify submissions
+    :param recorder: where to record latencies
+    """
+    steps = ([("GET", "/puzzle", None)] +
+             [("POST", "/verify", random_entries()) for _ in range(verifies)] +
+             [("POST", "/new_random", None)])
+    for method, path, data in steps:
+        start = perf_counter()
+        try:
+            ok = send(method, path, data) < 400
+        except Exception:
+            ok = False
+        recorder.record(path, perf_counter() - start, ok)
+
+
+def run_load(make_requester: Callable[[], Callable[[str, str, Dict[str, str]], int]],
+             concurrency: int, sessions: int, verifies: int) -> Dict[str, object]:
+    """
+    Run sessions spread over concurrent players
+
+    :param make_requester: creates the request function for one player thread
+    :param concurrency: number of simultaneous players
+    :param sessions: total sessions played
+    :param verifies: /verify submissions per session
+    :return: summary of throughput and latencies
+    """
+    recorder = LatencyRecorder()
+    remaining = [sessions]
+    remaining_lock = Lock()
+
+    def player() -> None:
+        send = make_requester()
+        while True:
+            with remaining_lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            run_session(send, verifies, recorder)
+
+    threads = [Thread(target=player) for _ in range(concurrency)]
+    start = perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    summary = recorder.summary(perf_counter() - start)
+    summary.update(concurrency=concurrency, sessions=sessions, verifies=verifies)
+    return summary
+
+
+def main() -> None:
+    parser = ArgumentParser(description="Load test the Regex Crossword app")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=100)
+    parser.add_argument("--verifies", type=int, default=3,
+                        help="/verify submissions per session")
+    parser.add_argument("--port", type=int, default=None,
+                        help="local port of a running app; in-process if omitted")
+    parser.add_argument("--output", default=None, help="file to write JSON results to")
+    args = parser.parse_args()
+
+    if args.port is None:
+        from RegexFlask import create_app
+        app = create_app(LOAD_TEST_CONFIG)
+        make_requester = lambda: in_process_requester(app)
+    else:
+        make_requester = lambda: port_requester(args.port)
+
+    summary = run_load(make_requester, args.concurrency, args.sessions, args.verifies)
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump(summary, output_file, indent=2)
+    print("{0:.1f} requests/s over {1:.2f}s".format(summary["throughput"],
+                                                     summary["elapsed_s"]))
+    for route, stats in summary["routes"].items():
+        print("{0:<12} p50 {1:7.2f}ms  p95 {2:7.2f}ms  p99 {3:7.2f}ms  errors {4}".format(
+            route, stats["p50_ms"], stats["p95_ms"], stats["p99_ms"], stats["errors"]))
+
+
+if __name__ == "__main__":
+    main()
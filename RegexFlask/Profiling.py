@@ -0,0 +1,210 @@
+import cProfile
+import hmac
+import os
+import pstats
+import random
+from hashlib import sha256
+from threading import Lock
+from time import time
+from typing import Callable, List, Optional
+from flask import Flask, g, request
+
+PROFILE_HEADER = 'X-Profile-Request'
+
+
+class RequestProfile:
+    _request: cProfile.Profile
+    _workers: List[cProfile.Profile]
+    """
+    Profile of one sampled request, covering the request thread and any
+    generation tasks it ran on worker threads
+
+    _request: profile of the request thread
+    _workers: profiles of tasks run on worker threads for the request
+    """
+
+    def __init__(self):
+        self._request = cProfile.Profile()
+        self._workers = []
+
+    def start(self) -> None:
+        self._request.enable()
+
+    def stop(self) -> None:
+        self._request.disable()
+
+    def wrap(self, task: Callable):
+        """
+        :param task: function to be run on a worker thread
+        :return: function running the task under its own profile, kept with this one
+        """
+        def profiled_task():
+            worker = cProfile.Profile()
+            try:
+                worker.enable()
+            except ValueError:
+                # From Python 3.12 only one profiler may be active, and the
+                # request's profiler already sees every thread
+                return task()
+            try:
+                return task()
+            finally:
+                worker.disable()
+                self._workers.append(worker)
+        return profiled_task
+
+    def dump(self, path: str) -> None:
+        """
+        Write the combined profiles as a pstats file
+        :param path: file to write to
+        """
+        stats = pstats.Stats(self._request)
+        for worker in self._workers:
+            stats.add(worker)
+        stats.dump_stats(path)
+
+
+class RequestProfiler:
+    _directory: str
+    _sample_rate: float
+    _secret: Optional[bytes]
+    _endpoints: List[str]
+    _max_bytes: int
+    _lock: Lock
+    """
+    Profiles a sampled fraction of requests, or requests carrying a signed
+    header, writing each as a pstats file. Only one request is profiled at a
+    time; others arriving meanwhile are served unprofiled.
+
+    _directory: folder profiles are written to
+    _sample_rate: fraction of requests profiled, from 0 to 1
+    _secret: key signed headers are checked against, None if headers are ignored
+    _endpoints: names of the endpoints which may be profiled
+    _max_bytes: most bytes of profiles kept, the oldest being deleted first
+    _lock: held while a request is being profiled
+    """
+
+    def __init__(self, directory: str, sample_rate: float = 0.0, secret: bytes = None,
+                 endpoints: List[str] = None, max_bytes: int = 50 * 1024 * 1024):
+        """
+        :param directory: folder profiles are written to
+        :param sample_rate: fraction of requests profiled, from 0 to 1
+        :param secret: key signed headers are checked against, None to ignore headers
+        :param endpoints: names of the endpoints which may be profiled, None for all
+        :param max_bytes: most bytes of profiles kept
+        """
+        self._directory = directory
+        self._sample_rate = sample_rate
+        self._secret = secret
+        self._endpoints = endpoints
+        self._max_bytes = max_bytes
+        self._lock = Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def before_request(self) -> None:
+        """
+        Start profiling the request if it is sampled or signed
+        """
+        if self._endpoints is not None and request.endpoint not in self._endpoints:
+            return
+        if not (random.random() < self._sample_rate or self._signed()):
+            return
+        if not self._lock.acquire(blocking=False):
+            return
+        profile = RequestProfile()
+        try:
+            profile.start()
+        except ValueError:
+            # Another profiler, such as a debugger's, is already active
+            self._lock.release()
+            return
+        g.request_profile = profile
+
+    def teardown_request(self, error=None) -> None:
+        """
+        Stop profiling the request, if it was, and write out its profile
+        """
+        profile = g.pop('request_profile', None)
+        if profile is None:
+            return
+        try:
+            profile.stop()
+            name = "{0:.6f}-{1}.pstats".format(time(), request.endpoint)
+            profile.dump(os.path.join(self._directory, name))
+            self._rotate()
+        finally:
+            self._lock.release()
+
+    def _signed(self) -> bool:
+        """
+        :return: True if the request carries an unexpired, correctly signed profile header
+        """
+        header = request.headers.get(PROFILE_HEADER)
+        if self._secret is None or header is None:
+            return False
+        expires, _, signature = header.partition(':')
+        try:
+            if int(expires) < time():
+                return False
+        except ValueError:
+            return False
+        expected = hmac.new(self._secret, expires.encode(), sha256).hexdigest()
+        return hmac.compare_digest(signature, expected)
+
+    def _rotate(self) -> None:
+        """
+        Delete the oldest profiles until those left fit in _max_bytes
+        """
+        profiles = sorted((entry for entry in os.scandir(self._directory)
+                           if entry.name.endswith('.pstats')), key=lambda entry: entry.name)
+        total = sum(entry.stat().st_size for entry in profiles)
+        for entry in profiles:
+            if total <= self._max_bytes:
+                break
+            total -= entry.stat().st_size
+            os.remove(entry.path)
+
+
+def init_profiling(app: Flask) -> Callable[[Callable], Callable]:
+    """
+    Register request profiling on the app if PROFILE_SAMPLE_RATE is above 0 or
+    PROFILE_SIGNED_HEADER is set. Otherwise nothing is registered, so requests
+    carry no profiling overhead. Signed headers are checked against
+    PROFILE_SECRET, kept apart from SECRET_KEY, which defaults to a value
+    anyone could sign with.
+
+    :param app: app to profile
+    :return: function wrapping a generation task so the current request's
+    profile covers it, returning the task unchanged when not profiling
+    :raises ValueError: if PROFILE_SIGNED_HEADER is set without PROFILE_SECRET
+    """
+    sample_rate = app.config['PROFILE_SAMPLE_RATE']
+    signed = app.config['PROFILE_SIGNED_HEADER']
+    if not sample_rate and not signed:
+        return lambda task: task
+
+    secret = None
+    if signed:
+        if not app.config['PROFILE_SECRET']:
+            raise ValueError("PROFILE_SIGNED_HEADER needs PROFILE_SECRET set to a secret of its own")
+        secret = str(app.config['PROFILE_SECRET']).encode()
+    profiler = RequestProfiler(os.path.join(app.instance_path, app.config['PROFILE_DIR']),
+                               sample_rate, secret, app.config['PROFILE_ENDPOINTS'],
+                               app.config['PROFILE_MAX_BYTES'])
+    app.before_request(profiler.before_request)
+    app.teardown_request(profiler.teardown_request)
+
+    def profiled(task: Callable) -> Callable:
+        profile = g.get('request_profile')
+        return task if profile is None else profile.wrap(task)
+    return profiled
+
+
+def sign_profile_request(secret: str, lifetime: float = 300) -> str:
+    """
+    :param secret: the app's PROFILE_SECRET
+    :param lifetime: seconds the header stays valid
+    :return: value of the X-Profile-Request header asking for a request to be profiled
+    """
+    expires = str(int(time() + lifetime))
+    return expires + ':' + hmac.new(secret.encode(), expires.encode(), sha256).hexdigest()
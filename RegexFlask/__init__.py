@@ -1,14 +1,63 @@
+import atexit
+import gc
 import os
-from flask import Flask, request, redirect, url_for, render_template
+import re
+import sys
+import time
+from threading import Lock
+
+try:
+    import fcntl
+except ImportError:  # Windows, where the single worker is not enforced
+    fcntl = None
+from flask import Flask, request, redirect, url_for, render_template, jsonify
 
 import RegexFlask.FlaskPuzzleManager
+from RegexFlask.LiveVerify import LiveVerifyServer
+from RegexFlask.Profiling import init_profiling
+from RegexEntities import BatchVerify, ClueGenerator, CrosswordGrid, Fingerprint, \
+    PuzzleManager, Snapshot, Solutions, Telemetry
+from RegexEntities.CluePool import CluePool
+from RegexEntities.GenerationPool import GenerationPool, GenerationBusy
 
 
-def create_app(test_config=None):
+def create_app(test_config=None, preload=None):
+    """
+    :param test_config: optional, settings used in place of the instance config.py
+    :param preload: if True, prepare shared data now and create each worker's
+    state on its first request, for servers forking workers from a preloaded
+    app. By default the PRELOAD setting.
+    """
     # Create and configure app
     app = Flask(__name__, instance_relative_config=True)
     app.config.from_mapping(
-        SECRET_KEY='dev'
+        SECRET_KEY='dev',
+        CUSTOM_PUZZLE_BUDGET=0.2,
+        CLUE_POOL_SIZE=64,
+        SNAPSHOT_FILE='puzzle_snapshot.json',
+        SNAPSHOT_INTERVAL=60,
+        SERVED_FILTER_FILE='served_puzzles.bloom',
+        SERVED_FILTER_CAPACITY=1000000,
+        SERVED_FILTER_ERROR_RATE=0.001,
+        TELEMETRY_FILE='telemetry.json',
+        LIVE_VERIFY_HOST='127.0.0.1',
+        LIVE_VERIFY_PORT=None,
+        LIVE_VERIFY_ORIGINS=None,
+        GENERATOR_TARGET_RATE=100.0,
+        GENERATOR_STRATEGY=None,
+        GENERATION_WORKERS=2,
+        GENERATION_QUEUE_LIMIT=8,
+        GENERATION_PREFETCH=4,
+        BATCH_VERIFY_MAX_SUBMISSIONS=10000,
+        BATCH_VERIFY_MAX_CELLS=400,
+        PROFILE_SAMPLE_RATE=0.0,
+        PROFILE_SIGNED_HEADER=False,
+        PROFILE_SECRET=None,
+        PROFILE_ENDPOINTS=['verify', 'new_random', 'new_premade', 'new_custom'],
+        PROFILE_DIR='profiles',
+        PROFILE_MAX_BYTES=50 * 1024 * 1024,
+        PRELOAD=False,
+        INSTANCE_LOCK_WAIT=10
     )
 
     if test_config is None:
@@ -21,7 +70,109 @@ def create_app(test_config=None):
     except OSError:
         pass
 
-    puzzle_manager = FlaskPuzzleManager.FlaskPuzzleManager()
+    if preload is None:
+        preload = app.config['PRELOAD']
+
+    profiled = init_profiling(app)
+
+    PuzzleManager.strategies.set_target(app.config['GENERATOR_TARGET_RATE'])
+    PuzzleManager.strategies.override(app.config['GENERATOR_STRATEGY'])
+    # Before forking and serving, so no player waits on the measurements
+    PuzzleManager.warm_strategies()
+
+    # Per-worker state, created by start_worker
+    puzzle_manager = None
+    telemetry = None
+    generation_pool = None
+    worker_lock = Lock()
+
+    def start_worker():
+        """
+        Create the state the serving process keeps: the current puzzle,
+        telemetry and saved files, and the background threads. All players
+        share the one current puzzle, so only one process may serve it.
+        """
+        nonlocal puzzle_manager, telemetry, generation_pool
+        if _uses_instance(app):
+            _claim_instance(app)
+        if app.config['CLUE_POOL_SIZE']:
+            clue_pool = CluePool(ClueGenerator.make_two_ranges,
+                                 capacity=app.config['CLUE_POOL_SIZE'],
+                                 low_water=app.config['CLUE_POOL_SIZE'] // 4)
+            clue_pool.start()
+            ClueGenerator.use_clue_pool(clue_pool)
+
+        snapshot_path = None
+        snapshot = None
+        if app.config['SNAPSHOT_FILE']:
+            snapshot_path = os.path.join(app.instance_path, app.config['SNAPSHOT_FILE'])
+            snapshot = Snapshot.load_snapshot(snapshot_path)
+
+        served_path = None
+        served = None
+        if app.config['SERVED_FILTER_FILE']:
+            served_path = os.path.join(app.instance_path, app.config['SERVED_FILTER_FILE'])
+            served = Fingerprint.load_bloom_filter(served_path)
+            if served is None:
+                served = Fingerprint.BloomFilter(app.config['SERVED_FILTER_CAPACITY'],
+                                                 app.config['SERVED_FILTER_ERROR_RATE'])
+
+        telemetry_path = None
+        if app.config['TELEMETRY_FILE']:
+            telemetry_path = os.path.join(app.instance_path, app.config['TELEMETRY_FILE'])
+
+        manager = FlaskPuzzleManager.FlaskPuzzleManager(snapshot, served)
+        recorder = Telemetry.Telemetry()
+        recorder.puzzle_started(manager.get_puzzle_id())
+
+        def save_state():
+            if snapshot_path is not None:
+                Snapshot.save_snapshot(manager.to_snapshot(), snapshot_path)
+            if served_path is not None:
+                served.save(served_path)
+            if telemetry_path is not None:
+                recorder.dump(telemetry_path)
+
+        if snapshot_path is not None or served_path is not None or telemetry_path is not None:
+            saver = Snapshot.PeriodicSave(save_state, app.config['SNAPSHOT_INTERVAL'])
+            if app.config['SNAPSHOT_INTERVAL']:
+                saver.start()
+            atexit.register(saver.stop)
+
+        pool = GenerationPool(manager.make_random_puzzle,
+                              workers=app.config['GENERATION_WORKERS'],
+                              queue_limit=app.config['GENERATION_QUEUE_LIMIT'],
+                              prefetch_size=app.config['GENERATION_PREFETCH'])
+        pool.refill()
+
+        if app.config['LIVE_VERIFY_PORT']:
+            LiveVerifyServer(manager, app.config['LIVE_VERIFY_HOST'],
+                             app.config['LIVE_VERIFY_PORT'],
+                             app.config['LIVE_VERIFY_ORIGINS']).start()
+
+        telemetry = recorder
+        generation_pool = pool
+        # Set last, so other request threads only see a complete worker
+        puzzle_manager = manager
+
+    if preload:
+        _preload(app)
+        if fcntl is not None and _uses_instance(app):
+            preloaded_by = os.getpid()
+            os.register_at_fork(after_in_child=lambda: _claim_forked_worker(app, preloaded_by))
+
+        @app.before_request
+        def start_worker_once():
+            if puzzle_manager is None:
+                with worker_lock:
+                    if puzzle_manager is None:
+                        start_worker()
+    else:
+        start_worker()
+
+    def busy():
+        return "Puzzle generation is busy, please try again shortly.", 503, \
+            {'Retry-After': '1'}
 
     @app.route('/')
     def index():
@@ -37,26 +188,105 @@ def create_app(test_config=None):
                                colclue4=col_clues[4], rowclue0=row_clues[0],
                                rowclue1=row_clues[1], rowclue2=row_clues[2],
                                rowclue3=row_clues[3], rowclue4=row_clues[4],
-                               more_premade=puzzle_manager.premade_remain())
+                               more_premade=puzzle_manager.premade_remain(),
+                               live_port=app.config['LIVE_VERIFY_PORT'])
 
     @app.route('/verify', methods=['POST', 'GET'])
     def verify():
         puzzle_manager.update(request)
-        if puzzle_manager.check_puzzle():
+        row_results, col_results = puzzle_manager.check_lines()
+        telemetry.record_attempt(row_results, col_results)
+        if all(row_results) and all(col_results):
             return redirect(url_for('correct'))
         else:
             return redirect(url_for('incorrect'))
 
+    @app.route('/batch_verify', methods=['POST'])
+    def batch_verify():
+        data = request.get_json(silent=True) or {}
+        try:
+            submissions = data['submissions']
+            rows, cols = data['puzzle']['shape'] if 'puzzle' in data else (5, 5)
+            cells = int(rows) * int(cols)
+        except (KeyError, ValueError, TypeError):
+            return jsonify(error="Expected submissions and an optional puzzle"), 400
+        if not isinstance(submissions, list) \
+                or not all(isinstance(submission, str) for submission in submissions):
+            return jsonify(error="Submissions must be a list of strings"), 400
+        if len(submissions) > app.config['BATCH_VERIFY_MAX_SUBMISSIONS']:
+            return jsonify(error="At most {0} submissions are checked at once".format(
+                app.config['BATCH_VERIFY_MAX_SUBMISSIONS'])), 400
+        submissions = [submission.upper() for submission in submissions]
+        if not 0 < cells <= app.config['BATCH_VERIFY_MAX_CELLS']:
+            return jsonify(error="Puzzles may have at most {0} cells".format(
+                app.config['BATCH_VERIFY_MAX_CELLS'])), 400
+        if 'puzzle' in data:
+            try:
+                puzzle = CrosswordGrid.dict_to_grid(data['puzzle'])
+                BatchVerify.check_clues(puzzle)
+            except ValueError as error:
+                return jsonify(error=str(error)), 400
+            except (KeyError, TypeError, re.error):
+                return jsonify(error="Expected submissions and an optional puzzle"), 400
+        else:
+            puzzle = puzzle_manager.get_puzzle()
+        lines = len(puzzle.get_row_clues()) + len(puzzle.get_col_clues())
+        results = BatchVerify.batch_verify(puzzle, submissions)
+        return jsonify(lines=lines, results=BatchVerify.format_results(results, lines),
+                       solved=BatchVerify.solved(results, lines))
+
     @app.route('/new_premade', methods=['POST', 'GET'])
     def new_premade():
-        puzzle_manager.new_premade_puzzle()
+        try:
+            puzzle_manager.set_puzzle(generation_pool.run(
+                profiled(puzzle_manager.make_premade_puzzle)))
+        except GenerationBusy:
+            return busy()
+        telemetry.puzzle_started(puzzle_manager.get_puzzle_id())
         return redirect(url_for('puzzle'))
 
     @app.route('/new_random', methods=['POST', 'GET'])
     def new_random():
-        puzzle_manager.new_random_puzzle()
+        try:
+            puzzle_manager.set_puzzle(generation_pool.run(
+                profiled(puzzle_manager.make_random_puzzle)))
+        except GenerationBusy:
+            return busy()
+        telemetry.puzzle_started(puzzle_manager.get_puzzle_id())
         return redirect(url_for('puzzle'))
 
+    @app.route('/metrics')
+    def metrics():
+        return jsonify(generation=generation_pool.metrics())
+
+    @app.route('/telemetry')
+    def telemetry_summary():
+        return jsonify(telemetry.summary())
+
+    @app.route('/new_custom', methods=['POST'])
+    def new_custom():
+        solution = request.form['solution']
+        hint = request.form.get('hint', 'No Hint')
+        try:
+            custom_puzzle, strategy, timing = generation_pool.run_exact(profiled(
+                lambda: puzzle_manager.make_custom_puzzle(
+                    solution, hint, app.config['CUSTOM_PUZZLE_BUDGET'])))
+        except GenerationBusy:
+            return busy()
+        except ValueError as error:
+            return jsonify(error=str(error)), 400
+        puzzle_manager.set_puzzle(custom_puzzle)
+        telemetry.puzzle_started(puzzle_manager.get_puzzle_id())
+        return jsonify(hint=puzzle_manager.get_hint(),
+                       row_clues=puzzle_manager.get_row_clues(),
+                       col_clues=puzzle_manager.get_col_clues(),
+                       strategy=strategy, timing_ms=timing)
+
+    @app.route('/strategies')
+    def strategies():
+        return jsonify(strategies=PuzzleManager.strategies.names(),
+                       stats=PuzzleManager.strategies.stats())
+
     @app.route('/correct')
     def correct():
         col_clues = puzzle_manager.get_col_clues()
@@ -86,3 +316,78 @@ def create_app(test_config=None):
                                more_premade=puzzle_manager.premade_remain())
 
     return app
+
+
+# Key is instance folder, value is the serving process id and its lock file
+_instance_locks = {}
+
+
+def _uses_instance(app) -> bool:
+    """
+    :return: True if the app saves files in its instance folder or binds the
+    live verify port, which only one process may do
+    """
+    return bool(app.config['SNAPSHOT_FILE'] or app.config['SERVED_FILTER_FILE']
+                or app.config['TELEMETRY_FILE'] or app.config['LIVE_VERIFY_PORT'])
+
+
+def _claim_instance(app):
+    """
+    Take the instance folder's lock for this process, so a second worker
+    can not serve a different current puzzle, overwrite the saved files or
+    bind the live verify port. The lock is released when the process exits.
+    While a server replaces its worker the old one may still hold the lock,
+    so it is waited for up to INSTANCE_LOCK_WAIT seconds.
+
+    :raises RuntimeError: if another process serves the instance folder
+    """
+    if fcntl is None or _instance_locks.get(app.instance_path, (None,))[0] == os.getpid():
+        return
+    lock_file = open(os.path.join(app.instance_path, 'worker.lock'), 'w')
+    deadline = time.monotonic() + app.config['INSTANCE_LOCK_WAIT']
+    while True:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            break
+        except OSError:
+            if time.monotonic() >= deadline:
+                lock_file.close()
+                raise RuntimeError("Another process already serves " + app.instance_path
+                                   + "; run a single worker, with threads for concurrency")
+            time.sleep(0.1)
+    _instance_locks[app.instance_path] = (os.getpid(), lock_file)
+
+
+def _claim_forked_worker(app, preloaded_by: int):
+    """
+    Claim the instance folder in a worker just forked from the preloaded
+    app, so a worker which can not serve it exits at startup instead of
+    failing every request it is given. Exit status 3 makes gunicorn stop,
+    reporting that a worker failed to boot.
+
+    :param preloaded_by: process which preloaded the app; forks by others are ignored
+    """
+    if os.getppid() != preloaded_by:
+        return
+    try:
+        _claim_instance(app)
+    except RuntimeError as error:
+        print(error, file=sys.stderr, flush=True)
+        os._exit(3)
+
+
+def _preload(app):
+    """
+    Do the loading every worker would repeat: compile the templates and run
+    each generation strategy once to fill lazily built tables and caches.
+    The premade data is loaded by importing RegexEntities. Everything
+    loaded so far is then frozen out of garbage collection, so collections
+    in forked workers do not write to those pages and they stay shared.
+    """
+    for name in app.jinja_env.list_templates():
+        app.jinja_env.get_template(name)
+    _, solution = next(Solutions.RandomSolutionIterator((5, 5)))
+    for strategy in PuzzleManager.DEADLINE_STRATEGIES:
+        strategy(solution, (5, 5)).generate_puzzle(filled=True).grid_check()
+    gc.collect()
+    gc.freeze()
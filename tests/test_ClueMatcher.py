@@ -0,0 +1,111 @@
+import re
+from random import Random
+from string import ascii_uppercase, digits
+
+import pytest
+
+from RegexEntities import ClueGenerator
+from RegexEntities.ClueMatcher import ClueMatcher, compile_clue
+
+ALPHABET = ascii_uppercase + digits
+# Lines also try characters no answer contains, so negated classes are exercised
+LINE_CHARS = ALPHABET + " _-!a"
+
+
+def random_lines(rng: Random, count: int, longest: int = 7):
+    return ["".join(rng.choice(LINE_CHARS) for _ in range(rng.randint(0, longest)))
+            for _ in range(count)]
+
+
+def random_clue(rng: Random) -> str:
+    """
+    :return: random clue in the dialect the generators emit
+    """
+    parts = []
+    for _ in range(rng.randint(1, 5)):
+        kind = rng.randrange(5)
+        if kind == 0:
+            part = "[" + "".join(rng.sample(ALPHABET, rng.randint(1, 4))) + "]"
+        elif kind == 1:
+            part = "."
+        elif kind == 2:
+            part = "\\" + rng.choice("wWdD")
+        elif kind == 3:
+            part = rng.choice(ALPHABET)
+        else:
+            length = rng.randint(1, 4)
+            options = ["".join(rng.choice(ALPHABET) for _ in range(length))
+                       for _ in range(rng.randint(2, 3))]
+            parts.append("(" + "|".join(options) + ")")
+            continue
+        if rng.random() < 0.3:
+            part += "+"
+        parts.append(part)
+    return "".join(parts)
+
+
+def assert_agrees(clue: str, lines):
+    matcher = compile_clue(clue)
+    pattern = re.compile(clue)
+    for line in lines:
+        assert matcher.matches(line) == (pattern.fullmatch(line) is not None), (clue, line)
+
+
+@pytest.mark.parametrize("strategy", [ClueGenerator.ClueGeneratorSeries,
+                                      ClueGenerator.ClueGeneratorIndividualOptionPairs])
+def test_generated_puzzles(strategy):
+    rng = Random(38)
+    for _ in range(50):
+        solution = "".join(rng.choice(ALPHABET) for _ in range(25))
+        puzzle = strategy(solution, (5, 5)).generate_puzzle(filled=True)
+        lines = random_lines(rng, 100) + [puzzle.get_row(row) for row in range(5)] \
+            + [puzzle.get_col(col) for col in range(5)]
+        for clue in puzzle.get_row_clues() + puzzle.get_col_clues():
+            assert isinstance(compile_clue(clue), ClueMatcher), clue
+            assert_agrees(clue, lines)
+        assert puzzle.grid_check()
+
+
+def test_random_dialect_clues():
+    rng = Random(380)
+    for _ in range(1000):
+        clue = random_clue(rng)
+        assert isinstance(compile_clue(clue), ClueMatcher), clue
+        assert_agrees(clue, random_lines(rng, 50))
+
+
+def test_empty_clue():
+    assert compile_clue("").matches("")
+    assert not compile_clue("").matches("A")
+
+
+@pytest.mark.parametrize("clue", ["A++", "((AB|CD)E|F)", "(A|B)+", "(A(B|C))",
+                                  "[^AB]", "[A-Z]", "A{2}", "A?B", "^AB$", "\\s"])
+def test_fallback_clues(clue):
+    with pytest.raises(ValueError):
+        ClueMatcher(clue)
+    assert_agrees(clue, random_lines(Random(clue), 200) + ["AB", "ABE", "AA", "F"])
+
+
+@pytest.mark.parametrize("clue", ["(AB", "[AB", "AB)", "[AB]+*"])
+def test_invalid_clues(clue):
+    with pytest.raises(ValueError):
+        ClueMatcher(clue)
+    with pytest.raises(re.error):
+        compile_clue(clue)
+
+
+@pytest.mark.parametrize("clue", ["\\w+", ".(AB|CD)", "[AÉ]"])
+def test_non_ascii_lines(clue):
+    assert_agrees(clue, ["É", "ÉAB", "AÉ", "ÀCD", "AB", "É" * 3])
+
+
+def test_full_table(monkeypatch):
+    monkeypatch.setattr("RegexEntities.ClueMatcher._MAX_STATES", 3)
+    rng = Random(3800)
+    for _ in range(100):
+        clue = random_clue(rng)
+        matcher = ClueMatcher(clue)
+        pattern = re.compile(clue)
+        for line in random_lines(rng, 50):
+            assert matcher.matches(line) == (pattern.fullmatch(line) is not None), (clue, line)